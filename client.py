@@ -0,0 +1,81 @@
+"""
+thin client for daemon.py that takes the same arguments as main.py and prints the evaluation summaries;
+it only needs the standard library so that it starts up quickly
+"""
+
+import sys
+import json
+import socket
+
+"""same as Daemon.Params.address"""
+DEFAULT_ADDRESS = 'log/eval_daemon.sock'
+
+
+def split_address(argv):
+    """
+    remove the @daemon group from argv
+
+    :param list[str] argv:
+    :return: daemon address and the remaining arguments
+    :rtype: str, list[str]
+    """
+    address = DEFAULT_ADDRESS
+    args = []
+    in_daemon = False
+    for arg in argv:
+        if arg.startswith('@'):
+            in_daemon = arg == '@daemon'
+            if in_daemon:
+                continue
+        elif in_daemon:
+            if arg.startswith('address='):
+                address = arg[len('address='):]
+            continue
+        args.append(arg)
+    return address, args
+
+
+def request(address, argv):
+    """
+    :param str address: Unix socket path or host:port
+    :param list[str] argv: arguments for main.py
+    :rtype: dict
+    """
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        sock = socket.create_connection((host.strip('[]'), int(port)))
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+
+    with sock:
+        sock.sendall((json.dumps(dict(argv=argv)) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as fid:
+            line = fid.readline()
+
+    if not line:
+        raise IOError('no response from the evaluation daemon at {}'.format(address))
+
+    return json.loads(line.decode('utf-8'))
+
+
+def main():
+    address, argv = split_address(sys.argv[1:])
+    response = request(address, argv)
+
+    for seq_name, summary in response['summaries'].items():
+        if seq_name == 'OVERALL':
+            continue
+        print('\n{}\n{}'.format(seq_name, summary))
+
+    if 'OVERALL' in response['summaries']:
+        print('\nOVERALL\n{}'.format(response['summaries']['OVERALL']))
+
+    if not response['success']:
+        if response['error']:
+            print(response['error'], file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
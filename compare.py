@@ -0,0 +1,209 @@
+try:
+    """has to be imported before any other package to avoid annoying
+    bad_alloc issues due to obscure conflicts with one or more other
+    packages including pytorch"""
+    import matlab.engine
+except ImportError:
+    pass
+
+import os
+import multiprocessing as mp
+from datetime import datetime
+
+import paramparse
+
+from utilities import CustomLogger, linux_path
+
+from params import Params
+from data import Data
+from tester import Tester
+
+"""logger of the worker processes which inherit it from the parent when they are forked"""
+_logger = None
+
+
+def evaluate_sequence(args):
+    """
+    read the annotations of one sequence once and match the tracking results of all trackers to them
+
+    :param tuple args: data params, tester params, seq_set, seq ID, results dirs, subseq_postfix and eval_dist_type
+    :return: sequence name and the MOT accumulator of each tracker or None if its results could not be loaded
+    :rtype: str, list
+    """
+    data_params, tester_params, seq_set, test_id, results_dirs, subseq_postfix, eval_dist_type = args
+
+    data = Data(data_params, _logger)
+    if not data.initialize(seq_set, test_id, 1, logger=_logger):
+        raise IOError('Data module failed to initialize with sequence {:d}'.format(test_id))
+
+    seq_logger = CustomLogger(_logger, names=(data.seq_name,), key='custom_header')
+    tester = Tester(tester_params, seq_logger)
+    tester.initialize(data, seq_logger)
+
+    if subseq_postfix:
+        load_fname = '{:s}_{:d}_{:d}.txt'.format(data.seq_name, data.start_frame_id + 1, data.end_frame_id + 1)
+    else:
+        load_fname = '{:s}.txt'.format(data.seq_name)
+
+    accs = []
+    for results_dir in results_dirs:
+        load_path = linux_path(results_dir, load_fname)
+        if not os.path.isfile(load_path) or not tester.load(load_path):
+            seq_logger.error('Tracking results could not be loaded from {:s}'.format(load_path))
+            accs.append(None)
+            continue
+        accs.append(tester.annotations.get_mot_accumulator(tester.input.tracking_res, eval_dist_type))
+
+    return data.seq_name, accs
+
+
+class Compare:
+    """
+    evaluate many trackers, each with its own results directory, on the same test sequences and rank them in a
+    single leaderboard; the annotations of each sequence are only read once for all the trackers and
+    the sequences are processed in parallel
+
+    :type _params: Compare.Params
+    :type _logger: CustomLogger
+    """
+
+    class Params:
+        """
+        :ivar results_dirs: directories containing the tracking results files of the trackers to be compared;
+        these are used as they are, i.e. results_dir_root, seq_set_info and load_prefix are not applied to them
+
+        :ivar names: names of the trackers in the leaderboard; defaults to results_dirs
+
+        :ivar sort_by: metric by which the leaderboard is sorted, e.g. MOTA, IDF1 or FN;
+        the best tracker is at the top for metrics where lower is better as well
+
+        :ivar processes: number of processes to evaluate the sequences and compute the metrics in;
+        0 uses all available cores and 1 disables multiprocessing
+
+        :ivar leaderboard_path: file to which the leaderboard is appended
+        """
+
+        def __init__(self):
+            self.results_dirs = ()
+            self.names = ()
+            self.sort_by = 'MOTA'
+            self.processes = 0
+            self.leaderboard_path = 'log/leaderboard.log'
+
+    """metrics for which lower values are better"""
+    ascending = ('MOTP', 'FP', 'FN', 'IDs', 'FM', 'ML')
+
+    def __init__(self, params, logger):
+        """
+        :type params: Compare.Params
+        :type logger: CustomLogger
+        :rtype: None
+        """
+        self._params = params
+        self._logger = logger
+
+    def run(self, data_params, tester_params, test_params):
+        """
+        :type data_params: Data.Params
+        :type tester_params: Tester.Params
+        :type test_params: Test.Params
+        :return: leaderboard with one row per tracker that has results for all the sequences
+        :rtype: pandas.DataFrame
+        """
+        import evaluation.motmetrics as mm
+
+        global _logger
+        _logger = self._logger
+
+        results_dirs = list(self._params.results_dirs)
+        names = list(self._params.names) if self._params.names else results_dirs
+        assert results_dirs, 'no results_dirs provided'
+        assert len(names) == len(results_dirs), 'names must be provided for all results_dirs'
+
+        processes = self._params.processes
+        if processes <= 0:
+            processes = mp.cpu_count()
+
+        seq_ids = test_params.seq[test_params.start:]
+        seq_args = [(data_params, tester_params, test_params.seq_set, test_id, results_dirs,
+                     test_params.subseq_postfix, test_params.eval_dist_type) for test_id in seq_ids]
+
+        self._logger.info('comparing {:d} trackers on {:d} sequences'.format(len(results_dirs), len(seq_ids)))
+
+        if processes > 1 and len(seq_args) > 1:
+            with mp.Pool(min(processes, len(seq_args))) as pool:
+                seq_results = pool.map(evaluate_sequence, seq_args)
+                pool.close()
+                pool.join()
+        else:
+            seq_results = [evaluate_sequence(_args) for _args in seq_args]
+
+        tracker_accs = []
+        tracker_names = []
+        for tracker_id, name in enumerate(names):
+            accs = [_accs[tracker_id] for _, _accs in seq_results]
+            missing = [seq_name for seq_name, _accs in seq_results if _accs[tracker_id] is None]
+            if missing:
+                self._logger.error('excluding {} since its results are missing for: {}'.format(
+                    name, ', '.join(missing)))
+                continue
+            tracker_accs.append(mm.MOTAccumulator.merge_event_dataframes(accs))
+            tracker_names.append(name)
+
+        assert tracker_accs, 'none of the trackers has results for all the sequences'
+
+        mh = mm.metrics.create()
+        leaderboard = mh.compute_many(tracker_accs, metrics=mm.metrics.motchallenge_metrics,
+                                      names=tracker_names, jobs=processes)
+        leaderboard = leaderboard.rename(columns=mm.io.motchallenge_metric_names)
+
+        sort_by = self._params.sort_by
+        assert sort_by in leaderboard.columns, 'invalid sort_by: {}; must be one of: {}'.format(
+            sort_by, ', '.join(leaderboard.columns))
+        leaderboard = leaderboard.sort_values(sort_by, ascending=sort_by in self.ascending, kind='mergesort')
+
+        strsummary = mm.io.render_summary(
+            leaderboard,
+            formatters=mh.formatters
+        )
+        print('\n' + strsummary + '\n')
+
+        leaderboard_path = self._params.leaderboard_path
+        if leaderboard_path:
+            leaderboard_dir = os.path.dirname(leaderboard_path)
+            if leaderboard_dir and not os.path.isdir(leaderboard_dir):
+                os.makedirs(leaderboard_dir)
+            time_stamp = datetime.now().strftime("%y%m%d_%H%M%S_%f")
+            self._logger.info('saving leaderboard to: {}'.format(leaderboard_path))
+            with open(leaderboard_path, 'a') as fid:
+                fid.write('{:s}\tseq_set: {:d}\tseq: {}\tsort_by: {:s}\n{:s}\n\n'.format(
+                    time_stamp, test_params.seq_set, list(seq_ids), sort_by, strsummary))
+
+        return leaderboard
+
+
+class CompareParams(Params):
+    """
+    :ivar compare: options of the comparison; the sequences are specified by the test options as in main.py
+    """
+
+    def __init__(self):
+        Params.__init__(self)
+        self.compare = Compare.Params()
+
+
+def main():
+    """get parameters"""
+    params = CompareParams()
+    paramparse.process(params, allow_unknown=1)
+    params.process()
+
+    """setup logger"""
+    _logger = CustomLogger.setup()
+
+    compare_logger = CustomLogger(_logger, names=('compare',), key='custom_header')
+    Compare(params.compare, compare_logger).run(params.data, params.tester, params.test)
+
+
+if __name__ == '__main__':
+    main()
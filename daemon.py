@@ -0,0 +1,208 @@
+try:
+    """has to be imported before any other package to avoid annoying
+    bad_alloc issues due to obscure conflicts with one or more other
+    packages including pytorch"""
+    import matlab.engine
+except ImportError:
+    pass
+
+import os
+import sys
+import json
+import signal
+import socket
+import socketserver
+import traceback
+
+import paramparse
+
+from utilities import CustomLogger
+
+from params import Params
+from data import Data
+from tester import Tester
+
+from run import Test
+
+
+class Daemon:
+    """
+    long lived evaluation server that keeps the annotations of all the sequences it has evaluated in memory;
+    each request is the list of command line arguments that would have been passed to main.py and is processed
+    exactly like main.py would process it, except that the annotations are only read the first time they are needed;
+    requests and responses are single lines of JSON sent over a Unix socket or a localhost TCP socket;
+    relative paths in the requests are resolved with respect to the working directory of the daemon
+
+    :type _params: Daemon.Params
+    :type _logger: CustomLogger
+    """
+
+    class Params:
+        """
+        :ivar address: Unix socket path to listen on or host:port to listen on a TCP socket instead;
+        since requests are not authenticated, the host must be a loopback one, i.e. 127.0.0.1, ::1 or localhost
+
+        :ivar preload: read the annotations of the test sequences configured on the command line of the daemon
+        before accepting any requests
+        """
+
+        def __init__(self):
+            self.address = 'log/eval_daemon.sock'
+            self.preload = 1
+
+    """hosts that a TCP address may use"""
+    loopback_hosts = ('127.0.0.1', '::1', 'localhost')
+
+    def __init__(self, params, logger):
+        """
+        :type params: Daemon.Params
+        :type logger: CustomLogger
+        :rtype: None
+        """
+        self._params = params
+        self._logger = logger
+
+        """annotations shared by the testers of all requests"""
+        self.annotations_cache = {}
+
+    def preload(self, data_params, tester_params, test_params):
+        """
+        read and index the annotations of the configured test sequences
+
+        :type data_params: Data.Params
+        :type tester_params: Tester.Params
+        :type test_params: Test.Params
+        :rtype: None
+        """
+        data = Data(data_params, self._logger)
+        tester = Tester(tester_params, self._logger, self.annotations_cache)
+        for test_id in test_params.seq:
+            if not data.initialize(test_params.seq_set, test_id, 1, logger=self._logger):
+                self._logger.error('Data module failed to initialize with sequence {:d}'.format(test_id))
+                continue
+            tester.initialize(data, self._logger)
+
+        self._logger.info('preloaded annotations for {:d} sequences'.format(len(self.annotations_cache)))
+
+    def evaluate(self, argv):
+        """
+        process the main.py arguments in argv and run the tests they specify
+
+        :param list[str] argv:
+        :return: success flag and string summaries of the evaluation of each sequence and OVERALL
+        :rtype: bool, dict
+        """
+        params = Params()
+
+        """config files are only processed when the arguments come from sys.argv"""
+        _argv = sys.argv
+        sys.argv = ['main.py', ] + list(argv)
+        try:
+            paramparse.process(params, allow_unknown=1)
+        finally:
+            sys.argv = _argv
+        params.process()
+
+        data = Data(params.data, self._logger)
+        test_logger = CustomLogger(self._logger, names=('test',), key='custom_header')
+        tester = Tester(params.tester, test_logger, self.annotations_cache)
+        success = Test.run(data, params.tester, params.test, test_logger, tester)
+
+        return success, tester.summaries
+
+    def handle(self, request):
+        """
+        :param dict request:
+        :rtype: dict
+        """
+        try:
+            success, summaries = self.evaluate(request['argv'])
+        except (Exception, SystemExit):
+            error = traceback.format_exc()
+            self._logger.error('request failed:\n{}'.format(error))
+            return dict(success=False, error=error, summaries={})
+
+        return dict(success=bool(success), error='', summaries=summaries)
+
+    def serve(self):
+        """
+        handle requests one at a time until interrupted since the evaluation pipeline is not thread safe
+
+        :rtype: None
+        """
+        daemon = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if not line:
+                    return
+                response = daemon.handle(json.loads(line.decode('utf-8')))
+                self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+        address = self._params.address
+        if ':' in address:
+            host, port = address.rsplit(':', 1)
+            host = host.strip('[]')
+            if host not in self.loopback_hosts:
+                raise ValueError('refusing to listen on non-loopback host {} since requests are not '
+                                 'authenticated; use one of: {}'.format(host, ', '.join(self.loopback_hosts)))
+
+            class Server(socketserver.TCPServer):
+                address_family = socket.AF_INET6 if host == '::1' else socket.AF_INET
+
+            server = Server((host, int(port)), RequestHandler)
+        else:
+            if os.path.exists(address):
+                os.remove(address)
+            address_dir = os.path.dirname(address)
+            if address_dir and not os.path.isdir(address_dir):
+                os.makedirs(address_dir)
+            server = socketserver.UnixStreamServer(address, RequestHandler)
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+
+        """SIGINT is ignored by processes started in the background"""
+        signal.signal(signal.SIGTERM, stop)
+
+        self._logger.info('listening on {}'.format(address))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if ':' not in address and os.path.exists(address):
+                os.remove(address)
+
+
+class DaemonParams(Params):
+    """
+    :ivar daemon: options of the daemon itself; all other options are the same as in main.py and
+    are only used for preloading annotations
+    """
+
+    def __init__(self):
+        Params.__init__(self)
+        self.daemon = Daemon.Params()
+
+
+def main():
+    """get parameters"""
+    params = DaemonParams()
+    paramparse.process(params, allow_unknown=1)
+    params.process()
+
+    """setup logger"""
+    _logger = CustomLogger.setup()
+
+    daemon_logger = CustomLogger(_logger, names=('daemon',), key='custom_header')
+    daemon = Daemon(params.daemon, daemon_logger)
+    if params.daemon.preload:
+        daemon.preload(params.data, params.tester, params.test)
+    daemon.serve()
+
+
+if __name__ == '__main__':
+    main()
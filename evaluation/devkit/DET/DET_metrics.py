@@ -1,6 +1,7 @@
 import math
 from collections import defaultdict
 from Metrics import Metrics
+from evaluate_detection import evaluate_detection
 import numpy as np
 
 
@@ -83,6 +84,9 @@ class DETMetrics(Metrics):
 
 	    xs = TP/self.n_gt
 	    ys = TP/(TP+FP)
+	    # recall and precision of the curve, e.g. for plot_precision_recall.plot_pr((self.rc, self.pr))
+	    self.rc = xs
+	    self.pr = ys
 	    xs1 = np.append(xs, np.inf)
 	    ys1 = np.append(ys, 0)
 
@@ -96,7 +100,13 @@ class DETMetrics(Metrics):
 
 	    self.AP = np.mean( self.RefPrcn )
 
-	def compute_metrics_per_sequence(self, sequence, pred_file, gt_file, gtDataDir, benchmark_name):
+	def compute_metrics_per_sequence(self, sequence, pred_file, gt_file, gtDataDir, benchmark_name, backend = "numpy"):
+
+		if backend == "numpy":
+			results = evaluate_detection(sequence, pred_file, gt_file, gtDataDir, benchmark_name)
+			self.update_values(results)
+			return
+		assert backend == "matlab", "Not valid backend. Value has to be 'numpy' or 'matlab'"
 
 		sum_tuple = lambda x: sum(map(sum_tuple, x)) if isinstance(x, tuple) else x
 		tuple_to_list = lambda x: list(map(tuple_to_list, x)) if isinstance(x, tuple) else x
@@ -117,4 +127,3 @@ class DETMetrics(Metrics):
 		results["scores"] = np.asarray(results['scores']).reshape(-1)
 		results["tp_list"] = np.asarray(results['tp_list']).reshape(-1)
 		self.update_values(update_dict)
-
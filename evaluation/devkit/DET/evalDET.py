@@ -8,8 +8,12 @@ import multiprocessing as mp
 
 
 class DET_evaluator(Evaluator):
-	def __init__(self):
+	def __init__(self, backend = "numpy"):
+		"""
+		backend: "numpy" for the native evaluation or "matlab" to run matlab_devkit/evaluateDetection.m
+		"""
 		self.type = "DET"
+		self.backend = backend
 	def eval(self):
 
 		arguments = []
@@ -21,7 +25,8 @@ class DET_evaluator(Evaluator):
 			"sequence": str(seq) ,
 			"pred_file":res,
 			"gt_file": gt,
-			"benchmark_name": self.benchmark_name}})
+			"benchmark_name": self.benchmark_name,
+			"backend": self.backend}})
 
 
 
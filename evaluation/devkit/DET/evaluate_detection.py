@@ -0,0 +1,217 @@
+import os
+import configparser
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# python port of matlab_devkit/evaluateDetection.m that does not need a MATLAB engine;
+# it follows the MATLAB code closely so that the numbers of both backends agree
+
+# class ids of the MOT ground truth, see matlab_devkit/utils/getClassLabels.m
+PEDESTRIAN = 1
+DISTRACTORS = [2, 7, 8, 12]    # person_on_vhcl, static_person, distractor, reflection
+DISTRACTORS_MOT20 = DISTRACTORS + [6]    # non_mot_vhcl
+
+
+def load_boxes(path):
+	"""
+	 Read a MOTChallenge CSV file into a 2D array, one row per box.
+	"""
+	if os.path.getsize(path) == 0:
+		return np.zeros((0, 10))
+	try:
+		data = np.loadtxt(path, delimiter=',', ndmin=2)
+	except ValueError:
+		data = np.loadtxt(path, ndmin=2)
+	return data
+
+
+def box_iou(a, b):
+	"""
+	 Intersection over union of all pairs of [x, y, w, h] boxes in a and b.
+	"""
+	a = np.asarray(a, dtype=float).reshape(-1, 4)
+	b = np.asarray(b, dtype=float).reshape(-1, 4)
+	w = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+	h = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+	isect = np.maximum(w, 0) * np.maximum(h, 0)
+	union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - isect
+	return np.divide(isect, union, out=np.zeros_like(isect), where=isect > 0)
+
+
+def frame_slices(frames, n_frames):
+	"""
+	 Row order that sorts by frame and the [start, end) range of the sorted rows of every frame 0..n_frames.
+	"""
+	order = np.argsort(frames, kind='mergesort')
+	bounds = np.searchsorted(frames[order], np.arange(n_frames + 2))
+	return order, bounds
+
+
+def match_boxes(gt, det, td=0.5):
+	"""
+	 Hungarian matching of gt and det boxes on 1 - IoU; pairs with 1 - IoU > td are never matched.
+	 Returns the matched gt rows, det rows and their IoUs.
+	"""
+	if not len(gt) or not len(det):
+		return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0)
+	ious = box_iou(gt, det)
+	cost = 1 - ious
+	valid = cost <= td
+	if not valid.any():
+		return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0)
+	# invalid pairs cost more than any set of valid matches so the number of matches is maximized first
+	cost[~valid] = min(cost.shape) + 1
+	rows, cols = linear_sum_assignment(cost)
+	keep = valid[rows, cols]
+	rows, cols = rows[keep], cols[keep]
+	return rows, cols, ious[rows, cols]
+
+
+def clean_results(det, gt, n_frames, minvis, distractors, td=0.5):
+	"""
+	 Remove result boxes that are matched to a distractor or to a gt box with visibility below minvis,
+	 like preprocessResult.m does for MOT16, MOT17 and MOT20 (without writing the cleaned file).
+	"""
+	keep = np.ones(len(det), dtype=bool)
+	det_order, det_bounds = frame_slices(det[:, 0], n_frames)
+	gt_order, gt_bounds = frame_slices(gt[:, 0], n_frames)
+	for t in range(1, n_frames + 1):
+		det_rows = det_order[det_bounds[t]:det_bounds[t + 1]]
+		gt_rows = gt_order[gt_bounds[t]:gt_bounds[t + 1]]
+		rows, cols, _ = match_boxes(gt[gt_rows, 2:6], det[det_rows, 2:6], td)
+		matched_gt = gt[gt_rows[rows]]
+		remove = np.isin(matched_gt[:, 7], distractors) | (matched_gt[:, 8] < minvis)
+		keep[det_rows[cols[remove]]] = False
+	print("Removing %d boxes from solution..." % np.count_nonzero(~keep))
+	return det[keep]
+
+
+def greedy_match(oa, thr=0.5):
+	"""
+	 Match detections sorted by descending score to gt boxes as bbGt.m evalRes does: every detection
+	 takes the unmatched gt box with the highest overlap of at least thr (the last one on ties).
+	 Returns 1 for detections that were matched and 0 otherwise.
+	"""
+	nd, ng = oa.shape
+	tp = np.zeros(nd)
+	if not nd or not ng:
+		return tp
+	gt_free = np.ones(ng, dtype=bool)
+	# only detections that overlap some gt box enough need to be looked at
+	for d in np.flatnonzero((oa >= thr).any(axis=1)):
+		row = np.where(gt_free, oa[d], -1)
+		g = ng - 1 - np.argmax(row[::-1])
+		if row[g] >= thr:
+			gt_free[g] = False
+			tp[d] = 1
+	return tp
+
+
+def evaluate_detection(sequence, pred_file, gt_file, gtDataDir, benchmark_name, td=0.5):
+	"""
+	 Evaluate the detections of one sequence.
+	 Returns the same values as the MATLAB evaluateDetection together with the recall ("rc")
+	 and precision ("pr") of the precision/recall curve, ready for plot_precision_recall.plot_pr.
+	"""
+	print("Sequence: %s" % sequence)
+
+	config = configparser.ConfigParser()
+	config.read(os.path.join(gtDataDir, "seqinfo.ini"))
+	n_frames = int(config['Sequence']['seqLength'])
+
+	# set visibility threshold to 25% for MOT 20
+	minvis = 0.5
+	if 'MOT20' in benchmark_name:
+		minvis = 0.25
+
+	# like preprocessResult.m, the distractor classes depend on the sequence rather than the benchmark
+	distractors = DISTRACTORS
+	if 'MOT20' in sequence:
+		distractors = DISTRACTORS_MOT20
+
+	gt_raw = load_boxes(gt_file)
+	det_raw = load_boxes(pred_file)
+
+	# if MOT16, MOT17 or MOT20 preprocess (clean)
+	if any(name in benchmark_name for name in ('MOT16', 'MOT17', 'MOT20', 'HOTA')):
+		det_raw = clean_results(det_raw, gt_raw, n_frames, minvis, distractors, td)
+
+	# keep pedestrians only and vis >= minvis
+	gt = gt_raw[(gt_raw[:, 7] == PEDESTRIAN) & (gt_raw[:, 8] >= minvis)]
+	det = det_raw
+
+	# CLEAR detection metrics (CLEAR_MOD_HUN.m); only frames up to the last one with a detection
+	# are evaluated, like in the MATLAB code
+	total_num_frames = int(gt[:, 0].max()) if len(gt) else 0
+	n_gt_trajectories = int(gt[:, 1].max()) if len(gt) else 0
+	last_det_frame = int(det[:, 0].max()) if len(det) else 0
+
+	# precision/recall (bbGt.m evalRes and compRoc) over all frames of the sequence
+	last_frame = max(n_frames, last_det_frame)
+	gt_order, gt_bounds = frame_slices(gt[:, 0], last_frame)
+	det_order, det_bounds = frame_slices(det[:, 0], last_frame)
+
+	n_gt = 0
+	n_tp = 0
+	n_det = 0
+	ious = []
+	scores = []
+	tp_list = []
+	for t in range(1, last_frame + 1):
+		gt_t = gt[gt_order[gt_bounds[t]:gt_bounds[t + 1]]]
+		det_t = det[det_order[det_bounds[t]:det_bounds[t + 1]]]
+
+		if t <= last_det_frame:
+			_, _, matched_ious = match_boxes(gt_t[:, 2:6], det_t[:, 2:6], td)
+			n_gt += len(gt_t)
+			n_det += len(det_t)
+			n_tp += len(matched_ious)
+			ious.append(matched_ious)
+
+		if t <= n_frames:
+			# highest scoring detections are matched first
+			by_score = np.argsort(-det_t[:, 6], kind='mergesort')
+			oa = box_iou(det_t[by_score, 2:6], gt_t[:, 2:6])
+			scores.append(det_t[by_score, 6])
+			tp_list.append(greedy_match(oa, td))
+
+	n_pr_gt = np.count_nonzero(gt[:, 0] <= n_frames)
+	ious = np.concatenate(ious) if ious else np.zeros(0)
+	scores = np.concatenate(scores) if scores else np.zeros(0)
+	tp_list = np.concatenate(tp_list) if tp_list else np.zeros(0)
+
+	# cumulative true and false positives over all detections sorted by score
+	order = np.argsort(-scores, kind='mergesort')
+	scores = scores[order]
+	tp_list = tp_list[order]
+	tp = np.cumsum(tp_list)
+	fp = np.cumsum(tp_list != 1)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		rc = tp / float(n_pr_gt)
+		pr = tp / (fp + tp)
+
+	# precision at the reference recall values
+	ref = np.linspace(0, 1, 11)
+	refprcn = np.zeros(len(ref))
+	if len(scores):
+		xs1 = np.append(rc, np.inf)
+		ys1 = np.append(pr, 0)
+		refprcn = ys1[np.argmax(xs1[None, :] >= ref[:, None], axis=1)]
+
+	print("Average Precision: %.4f" % np.mean(refprcn))
+
+	return {
+		"fn": n_gt - n_tp,
+		"fp": n_det - n_tp,
+		"n_gt": n_gt,
+		"tp": n_tp,
+		"total_num_frames": total_num_frames,
+		"n_gt_trajectories": n_gt_trajectories,
+		"ious": ious,
+		"td": td,
+		"refprcn": refprcn,
+		"scores": scores,
+		"tp_list": tp_list,
+		"rc": rc,
+		"pr": pr,
+	}
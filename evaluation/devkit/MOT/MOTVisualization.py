@@ -6,6 +6,7 @@ import numpy as np
 
 
 class MOTVisualizer(Visualizer):
+	draw_on_scaled = True
 
 	def load(self, FilePath):
 		data = np.genfromtxt(FilePath, delimiter=',')
@@ -19,6 +20,10 @@ class MOTVisualizer(Visualizer):
 		#data = data[~np.isnan(data)]
 		nan_index = np.sum( np.isnan(data ), axis = 1)
 		data = data[nan_index==0]
+
+		# rows of each frame and the maximum confidence are looked up once instead of on every frame
+		self.frameIndex = self.indexFrames(data[:,0])
+		self.maxConf = max(data[:,6]) if len(data) else 1
 		return data
 
 	def drawResults(self, im = None, t = 0):
@@ -26,12 +31,12 @@ class MOTVisualizer(Visualizer):
 
 		maxConf = 1
 		if self.mode == "det":
-			maxConf = max(self.resFile[:,6])
+			maxConf = self.maxConf
 
 
 
 		# boxes in this frame
-		thisF=np.flatnonzero(self.resFile[:,0]==t)
+		thisF=self.frameIndex.get(t, [])
 
 
 		for bb in thisF:
@@ -42,11 +47,6 @@ class MOTVisualizer(Visualizer):
 			width=((self.resFile[bb,4])*self.imScale).astype(int)
 			height=((self.resFile[bb,5])*self.imScale).astype(int)
 
-			left=((self.resFile[bb,2]-1)).astype(int)
-			top=((self.resFile[bb,3]-1)).astype(int)
-			width=((self.resFile[bb,4])).astype(int)
-			height=((self.resFile[bb,5])).astype(int)
-
 			# normalize confidence to [0,5]
 			rawConf=self.resFile[bb,6]
 			conf=(rawConf)/maxConf
@@ -70,16 +70,14 @@ class MOTVisualizer(Visualizer):
 			# occluder
 			if ((self.mode == "gt") & (self.showOccluder) & (int(label) in [9, 10, 11, 13])):
 
-				overlay = im.copy()
 				alpha = 0.7
 				color = (0.7*255, 0.7*255, 0.7*255)
-				cv2.rectangle(overlay,pt1,pt2,color ,-1)
-				im = cv2.addWeighted(overlay, alpha, im, 1 - alpha, 0)
+				im = self.blendRect(im, pt1, pt2, color, alpha)
 
 			else:
-				cv2.rectangle(im,pt1,pt2,color,2)
+				cv2.rectangle(im,pt1,pt2,color,max(1, int(round(2*self.imScale))))
 				if not self.mode == "det":
-					cv2.putText(im,IDstr,pt1,cv2.FONT_HERSHEY_SIMPLEX,1, color = color)
+					cv2.putText(im,IDstr,pt1,cv2.FONT_HERSHEY_SIMPLEX,self.imScale, color = color)
 
 		return im
 
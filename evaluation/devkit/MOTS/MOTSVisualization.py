@@ -6,14 +6,62 @@ import glob
 import os
 import cv2
 import colorsys
+import multiprocessing as mp
 import numpy as np
 
-def apply_mask(image, mask, color, alpha=0.5):
+def rle_counts(mask):
 	"""
-	 Apply the given mask to the image.
+	 Run lengths of an RLE mask, decoding the compressed COCO string if needed.
 	"""
-	for c in range(3):
-		image[:, :, c] = np.where(mask == 1, image[:, :, c] * (1 - alpha) + alpha * color[c],image[:, :, c])
+	s = mask["counts"]
+	if not isinstance(s, (bytes, str)):
+		return np.asarray(s, dtype=np.int64)
+	if isinstance(s, str):
+		s = s.encode(encoding='UTF-8')
+	counts = []
+	p = 0
+	while p < len(s):
+		x = 0
+		k = 0
+		more = 1
+		while more:
+			c = s[p] - 48
+			x |= (c & 0x1f) << 5 * k
+			more = c & 0x20
+			p += 1
+			k += 1
+			if not more and (c & 0x10):
+				x |= -1 << 5 * k
+		if len(counts) > 2:
+			x += counts[-2]
+		counts.append(x)
+	return np.asarray(counts, dtype=np.int64)
+
+
+def draw_label(label_t, mask, value):
+	"""
+	 Write value into the pixels of an RLE mask.
+	 label_t is the transposed (width x height) label image so that its flat index is the
+	 column-major pixel index used by RLE; only the foreground runs are touched.
+	"""
+	counts = rle_counts(mask)
+	ends = np.cumsum(counts)
+	starts = ends[0:-1:2]
+	lengths = counts[1::2]
+	if not len(lengths) or not lengths.sum():
+		return
+	idx = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+	label_t.reshape(-1)[idx] = value
+
+
+def apply_label(image, label, colors, alpha=0.5):
+	"""
+	 Blend the colour of each label into the image; label 0 is left untouched.
+	 colors holds one colour per label so that the blend is a single table lookup.
+	"""
+	fg = label > 0
+	lut = alpha * np.asarray(colors, dtype=float)
+	image[fg] = image[fg] * (1 - alpha) + lut[label[fg]]
 	return image
 
 
@@ -27,8 +75,15 @@ class MOTSVisualizer(Visualizer):
 	def drawResults(self, im = None, t = 0):
 		self.draw_boxes = False
 
+		objects = self.resFile.get(t, [])
 
-		for obj in self.resFile[t]:
+		# all masks of the frame are collected in one label image and blended at once;
+		# later objects are drawn over earlier ones
+		height, width = im.shape[:2]
+		label_t = np.zeros((width, height), dtype=np.uint16)
+		label_colors = [(0, 0, 0)]
+
+		for obj in objects:
 
 			color = self.colors[obj.track_id % len(self.colors)]
 
@@ -54,12 +109,47 @@ class MOTSVisualizer(Visualizer):
 				if self.draw_boxes:
 					cv2.rectangle(im,pt1,pt2,color,2)
 
+			label_colors.append(color)
+			draw_label(label_t, obj.mask, len(label_colors) - 1)
 
-			binary_mask = rletools.decode(obj.mask)
-
-			im = apply_mask(im, binary_mask, color)
+		im = apply_label(im, label_t.T, label_colors)
 		return im
 
+
+def render_sequence(visualizer, args):
+	""" Renders the video of an individual sequence
+
+	:param MOTSVisualizer visualizer: visualizer set up for the sequence
+	:param dict args: dictionary with args for generateVideo
+	:return: path of the rendered video
+	"""
+	visualizer.generateVideo(**args)
+	return visualizer.outputName
+
+
+def generateVideos(visualizers, processes = None, **kwargs):
+	""" Renders the videos of several sequences concurrently, one process per sequence
+
+	:param list visualizers: one MOTSVisualizer per sequence
+	:param int processes: number of processes, defaults to the number of cores
+	:param kwargs: args passed to generateVideo for every sequence
+	:return: paths of the rendered videos
+	"""
+	if processes is None:
+		processes = mp.cpu_count()
+	processes = max(1, min(processes, len(visualizers)))
+
+	if processes == 1:
+		return [render_sequence(visualizer, kwargs) for visualizer in visualizers]
+
+	# the workers are terminated when leaving the block even if a sequence fails
+	with mp.Pool(processes) as p:
+		jobs = [p.apply_async(render_sequence, (visualizer, kwargs)) for visualizer in visualizers]
+		outputs = [job.get() for job in jobs]
+		p.close()
+		p.join()
+	return outputs
+
 if __name__ == "__main__":
 	visualizer = MOTSVisualizer(
 	seqName = "MOTS20-11",
@@ -20,6 +20,25 @@ def mask_iou(a, b, criterion="union"):
 
 
 
+def frame_overlaps(gts, trs, ignore_region, overlap_function = mask_iou):
+	"""
+	Overlap of every ground truth object with every tracker object and of every tracker object
+	with the ignore region. The default mask IoU is computed with one rletools.iou call per matrix.
+	"""
+	if overlap_function is not mask_iou:
+		ious = np.array([[overlap_function(gg, tt) for tt in trs] for gg in gts], dtype=float).reshape(len(gts), len(trs))
+		ignore_ious = np.array([overlap_function(tt, ignore_region, "a") for tt in trs], dtype=float)
+		return ious, ignore_ious
+
+	ious = np.zeros((len(gts), len(trs)))
+	ignore_ious = np.zeros(len(trs))
+	if len(trs) > 0:
+		tr_masks = [tt.mask for tt in trs]
+		if len(gts) > 0:
+			ious = np.asarray(rletools.iou([gg.mask for gg in gts], tr_masks, [False] * len(trs)), dtype=float)
+		ignore_ious = np.asarray(rletools.iou(tr_masks, [ignore_region.mask], [True]), dtype=float).reshape(len(trs))
+	return ious, ignore_ious
+
 
 class MOTSMetrics(Metrics):
 	def __init__(self, seqName = None):
@@ -164,9 +183,11 @@ class MOTSMetrics(Metrics):
 	# go through all frames and associate ground truth and tracker results
 
 	def compute_metrics_per_sequence(self, sequence, pred_file, gt_file, gtDataDir, benchmark_name,
-						ignore_class = IGNORE_CLASS, class_id = CLASS_ID, overlap_function = mask_iou):
+						ignore_class = IGNORE_CLASS, class_id = CLASS_ID, overlap_function = mask_iou,
+						validate_gt = True, cache_dir = None):
 
-		gt_seq = load_txt(gt_file)
+		# the ground truth can be trusted and cached since it is evaluated against repeatedly
+		gt_seq = load_txt(gt_file, validate = validate_gt, cache_dir = cache_dir)
 		results_seq = load_txt(pred_file)
 
 
@@ -196,7 +217,8 @@ class MOTSMetrics(Metrics):
 		n_gts = 0
 		n_trs = 0
 
-		frame_to_ignore_region = {}
+		# per-frame overlaps kept for the ID measures
+		id_frames = []
 
 		# Iterate over frames in this sequence
 		for f in range(max_frames + 1):
@@ -220,9 +242,8 @@ class MOTSMetrics(Metrics):
 			# Handle ignore regions as one large ignore region
 			dc = SegmentedObject(mask=rletools.merge([d.mask for d in dc], intersect=False),
 			                                         class_id=ignore_class, track_id=ignore_class)
-			frame_to_ignore_region[f] = dc
 
-			tracks_valid = [False for _ in range(len(t))]
+			tracks_valid = np.zeros(len(t), dtype=bool)
 
 			# counting total number of ground truth and tracker objects
 			self.n_gt += len(g)
@@ -247,31 +268,28 @@ class MOTSMetrics(Metrics):
 			# extend groundtruth trajectories lists (merge lists)
 			for gg in g:
 				seq_trajectories[gg.track_id].append(-1)
-			num_associations = 0
-			for row, gg in enumerate(g):
-				for col, tt in enumerate(t):
-					c = overlap_function(gg, tt)
-					if c > 0.5:
-						tracks_valid[col] = True
-						self.total_cost += c
-						tmpc += c
-						tmpcs[row] = c
-						seq_trajectories[g[row].track_id][-1] = t[col].track_id
-
-						# true positives are only valid associations
-						self.tp += 1
-						tmptp += 1
-
-						num_associations += 1
+
+			# overlaps of all ground truth/tracker pairs and of all tracker objects with the ignore region
+			ious, ignore_ious = frame_overlaps(g, t, dc, overlap_function)
+			id_frames.append(([gg.track_id for gg in g], [tt.track_id for tt in t], ious, ignore_ious > 0.5))
+
+			rows, cols = np.nonzero(ious > 0.5)
+			num_associations = len(rows)
+			for row, col in zip(rows, cols):
+				c = ious[row, col]
+				self.total_cost += c
+				tmpc += c
+				tmpcs[row] = c
+				seq_trajectories[g[row].track_id][-1] = t[col].track_id
+			tracks_valid[cols] = True
+
+			# true positives are only valid associations
+			self.tp += num_associations
+			tmptp += num_associations
 
 			# associate tracker and DontCare areas
 			# ignore tracker in neighboring classes
-			nignoredtracker = 0    # number of ignored tracker detections
-
-			for i, tt in enumerate(t):
-				overlap = overlap_function(tt, dc, "a")
-				if overlap > 0.5 and not tracks_valid[i]:
-					nignoredtracker += 1
+			nignoredtracker = int(np.count_nonzero((ignore_ious > 0.5) & ~tracks_valid))    # number of ignored tracker detections
 
 			# count the number of ignored tracker objects
 			self.n_itr += nignoredtracker
@@ -373,7 +391,7 @@ class MOTSMetrics(Metrics):
 					self.PT += 1
 
 			# compute IDF1
-			idf1, idtp, nbox_gt, id_n_tr  = compute_idf1_and_idtp_for_sequence(gt_seq, results_seq, gt_track_ids, tr_track_ids, frame_to_ignore_region)
+			idf1, idtp, nbox_gt, id_n_tr  = compute_idf1_and_idtp_for_sequence(id_frames, gt_track_ids, tr_track_ids)
 			self.IDTP = idtp
 			#self.id_ign = id_ign
 			self.id_n_tr = id_n_tr
@@ -385,37 +403,55 @@ class MOTSMetrics(Metrics):
 
 ### IDF1 stuff
 ### code below adapted from https://github.com/shenh10/mot_evaluation/blob/5dd51e5cb7b45992774ea150e4386aa0b02b586f/utils/measurements.py
-def compute_idf1_and_idtp_for_sequence(frame_to_gt, frame_to_pred, gt_ids, st_ids, frame_to_ignore_region):
-	frame_to_can_be_ignored = {}
-	for t in frame_to_pred.keys():
-		preds_t = frame_to_pred[t]
-		pred_masks_t = [p.mask for p in preds_t]
-		ignore_region_t = frame_to_ignore_region[t].mask
-		overlap = np.squeeze(rletools.iou(pred_masks_t, [ignore_region_t], [1]), axis=1)
-		frame_to_can_be_ignored[t] = overlap > 0.5
-
+def compute_idf1_and_idtp_for_sequence(id_frames, gt_ids, st_ids):
+	"""
+	id_frames holds one (gt track ids, tracker track ids, ious, can be ignored) tuple per frame
+	with the overlaps already computed for CLEAR-MOT; the pairwise trajectory costs are accumulated
+	from the matches of every frame instead of comparing each pair of trajectories separately
+	"""
 	gt_ids = sorted(gt_ids)
 	st_ids = sorted(st_ids)
-	groundtruth = [[] for _ in gt_ids]
-	prediction = [[] for _ in st_ids]
-	for t, gts_t in frame_to_gt.items():
-		for gt_t in gts_t:
-			if gt_t.track_id in gt_ids:
-				groundtruth[gt_ids.index(gt_t.track_id)].append((t, gt_t))
-	for t in frame_to_pred.keys():
-		preds_t = frame_to_pred[t]
-		can_be_ignored_t = frame_to_can_be_ignored[t]
-		assert len(preds_t) == len(can_be_ignored_t)
-		for pred_t, ign_t in zip(preds_t, can_be_ignored_t):
-			if pred_t.track_id in st_ids:
-				prediction[st_ids.index(pred_t.track_id)].append((t, pred_t, ign_t))
-	for gt in groundtruth:
-		gt.sort(key=lambda x: x[0])
-	for pred in prediction:
-		pred.sort(key=lambda x: x[0])
-
+	gt_slot = {track_id: i for i, track_id in enumerate(gt_ids)}
+	st_slot = {track_id: i for i, track_id in enumerate(st_ids)}
 	n_gt = len(gt_ids)
 	n_st = len(st_ids)
+
+	gt_slots = []
+	st_slots = []
+	st_ignored = []
+	match_gt = []
+	match_st = []
+	match_ignored = []
+	for gt_ids_t, st_ids_t, ious_t, can_be_ignored_t in id_frames:
+		gt_slots_t = np.array([gt_slot[x] for x in gt_ids_t], dtype=int)
+		st_slots_t = np.array([st_slot[x] for x in st_ids_t], dtype=int)
+		gt_slots.append(gt_slots_t)
+		st_slots.append(st_slots_t)
+		st_ignored.append(can_be_ignored_t)
+		# a gt and a tracker point in the same frame are matched if their overlap is at least 0.5
+		rows, cols = np.nonzero(ious_t >= 0.5)
+		match_gt.append(gt_slots_t[rows])
+		match_st.append(st_slots_t[cols])
+		match_ignored.append(can_be_ignored_t[cols])
+
+	gt_slots = np.concatenate(gt_slots) if gt_slots else np.zeros(0, dtype=int)
+	st_slots = np.concatenate(st_slots) if st_slots else np.zeros(0, dtype=int)
+	st_ignored = np.concatenate(st_ignored).astype(bool) if st_ignored else np.zeros(0, dtype=bool)
+	match_gt = np.concatenate(match_gt) if match_gt else np.zeros(0, dtype=int)
+	match_st = np.concatenate(match_st) if match_st else np.zeros(0, dtype=int)
+	match_ignored = np.concatenate(match_ignored).astype(bool) if match_ignored else np.zeros(0, dtype=bool)
+
+	# number of points in each trajectory and, for the tracker ones, how many can be ignored
+	gt_len = np.bincount(gt_slots, minlength=n_gt)
+	st_len = np.bincount(st_slots, minlength=n_st)
+	st_ign = np.bincount(st_slots, weights=st_ignored, minlength=n_st)
+
+	# number of matched points for every trajectory pair, split by whether the tracker point can be ignored
+	matched = np.zeros((n_gt, n_st), dtype=float)
+	matched_ign = np.zeros((n_gt, n_st), dtype=float)
+	np.add.at(matched, (match_gt, match_st), 1)
+	np.add.at(matched_ign, (match_gt, match_st), match_ignored)
+
 	cost = np.zeros((n_gt + n_st, n_st + n_gt), dtype=float)
 	cost[n_gt:, :n_st] = sys.maxsize    # float('inf')
 	cost[:n_gt, n_st:] = sys.maxsize    # float('inf')
@@ -423,46 +459,32 @@ def compute_idf1_and_idtp_for_sequence(frame_to_gt, frame_to_pred, gt_ids, st_id
 	fp = np.zeros(cost.shape)
 	fn = np.zeros(cost.shape)
 	ign = np.zeros(cost.shape)
-	# cost matrix of all trajectory pairs
-	cost_block, fp_block, fn_block, ign_block = cost_between_gt_pred(groundtruth, prediction)
-	cost[:n_gt, :n_st] = cost_block
-	fp[:n_gt, :n_st] = fp_block
-	fn[:n_gt, :n_st] = fn_block
-	ign[:n_gt, :n_st] = ign_block
+	# cost matrix of all trajectory pairs; unmatched tracker points are false positives
+	# unless they can be ignored
+	fn[:n_gt, :n_st] = gt_len[:, None] - matched
+	fp[:n_gt, :n_st] = (st_len - st_ign)[None, :] - (matched - matched_ign)
+	ign[:n_gt, :n_st] = st_ign[None, :] - matched_ign
+	cost[:n_gt, :n_st] = fp[:n_gt, :n_st] + fn[:n_gt, :n_st]
 
 	# computed trajectory match no groundtruth trajectory, FP
-	for i in range(n_st):
-		#cost[i + n_gt, i] = prediction[i].shape[0]
-		#fp[i + n_gt, i] = prediction[i].shape[0]
-		# don't count fp in case of ignore region
-		fps = sum([~x[2] for x in prediction[i]])
-		ig = sum([x[2] for x in prediction[i]])
-		cost[i + n_gt, i] = fps
-		fp[i + n_gt, i] = fps
-		ign[i + n_gt, i] = ig
+	# don't count fp in case of ignore region
+	st_diag = np.arange(n_st)
+	cost[st_diag + n_gt, st_diag] = st_len - st_ign
+	fp[st_diag + n_gt, st_diag] = st_len - st_ign
+	ign[st_diag + n_gt, st_diag] = st_ign
 
 	# groundtruth trajectory match no computed trajectory, FN
-	for i in range(n_gt):
-		#cost[i, i + n_st] = groundtruth[i].shape[0]
-		#fn[i, i + n_st] = groundtruth[i].shape[0]
-		cost[i, i + n_st] = len(groundtruth[i])
-		fn[i, i + n_st] = len(groundtruth[i])
+	gt_diag = np.arange(n_gt)
+	cost[gt_diag, gt_diag + n_st] = gt_len
+	fn[gt_diag, gt_diag + n_st] = gt_len
 	# TODO: add error handling here?
 	matched_indices = linear_assignment(cost)
-	#nbox_gt = sum([groundtruth[i].shape[0] for i in range(n_gt)])
-	#nbox_st = sum([prediction[i].shape[0] for i in range(n_st)])
-	nbox_gt = sum([len(groundtruth[i]) for i in range(n_gt)])
-
-	nbox_st = sum([len(prediction[i]) for i in range(n_st)])
-
-	#IDFP = 0
-	IDFN = 0
-	id_ign = 0
-	for matched in zip(*matched_indices):
-		#IDFP += fp[matched[0], matched[1]]
-		IDFN += fn[matched[0], matched[1]]
-		# exclude detections which are not matched and ignored from total count
-		id_ign += ign[matched[0], matched[1]]
+	nbox_gt = int(gt_len.sum())
+	nbox_st = int(st_len.sum())
+
+	IDFN = fn[matched_indices].sum()
+	# exclude detections which are not matched and ignored from total count
+	id_ign = ign[matched_indices].sum()
 	id_n_tr = nbox_st - id_ign
 
 	IDTP = nbox_gt - IDFN
@@ -470,104 +492,3 @@ def compute_idf1_and_idtp_for_sequence(frame_to_gt, frame_to_pred, gt_ids, st_id
 	IDF1 = 2 * IDTP / (nbox_gt + id_n_tr)
 
 	return IDF1, IDTP, nbox_gt, id_n_tr
-
-
-
-
-def cost_between_gt_pred(groundtruth, prediction):
-	n_gt = len(groundtruth)
-	n_st = len(prediction)
-	cost = np.zeros((n_gt, n_st), dtype=float)
-	fp = np.zeros((n_gt, n_st), dtype=float)
-	fn = np.zeros((n_gt, n_st), dtype=float)
-	ign = np.zeros((n_gt, n_st), dtype=float)
-	for i in range(n_gt):
-		for j in range(n_st):
-			fp[i, j], fn[i, j], ign[i, j] = cost_between_trajectories(groundtruth[i], prediction[j])
-			cost[i, j] = fp[i, j] + fn[i, j]
-	return cost, fp, fn, ign
-
-
-def cost_between_trajectories(traj1, traj2):
-	#[npoints1, dim1] = traj1.shape
-	#[npoints2, dim2] = traj2.shape
-	npoints1 = len(traj1)
-	npoints2 = len(traj2)
-	# find start and end frame of each trajectories
-	#start1 = traj1[0, 0]
-	#end1 = traj1[-1, 0]
-	#start2 = traj2[0, 0]
-	#end2 = traj2[-1, 0]
-	times1 = [x[0] for x in traj1]
-	times2 = [x[0] for x in traj2]
-	start1 = min(times1)
-	start2 = min(times2)
-	end1 = max(times1)
-	end2 = max(times2)
-
-	ign = [traj2[i][2] for i in range(npoints2)]
-
-	# check frame overlap
-	#has_overlap = max(start1, start2) < min(end1, end2)
-	# careful, changed this to <=, but I think now it's right
-	has_overlap = max(start1, start2) <= min(end1, end2)
-	if not has_overlap:
-		fn = npoints1
-		#fp = npoints2
-		# disregard detections which can be ignored
-		fp = sum([~x for x in ign])
-		ig = sum(ign)
-		return fp, fn, ig
-
-	# gt trajectory mapping to st, check gt missed
-	matched_pos1 = corresponding_frame(times1, npoints1, times2, npoints2)
-	# st trajectory mapping to gt, check computed one false alarms
-	matched_pos2 = corresponding_frame(times2, npoints2, times1, npoints1)
-	overlap1 = compute_overlap(traj1, traj2, matched_pos1)
-	overlap2 = compute_overlap(traj2, traj1, matched_pos2)
-	# FN
-	fn = sum([1 for i in range(npoints1) if overlap1[i] < 0.5])
-	# FP
-	# don't count false positive in case of ignore region
-	unmatched = [overlap2[i] < 0.5 for i in range(npoints2)]
-	#fp = sum([1 for i in range(npoints2) if overlap2[i] < 0.5 and not traj2[i][2]])
-	fp = sum([1 for i in range(npoints2) if unmatched[i] and not ign[i]])
-	ig = sum([1 for i in range(npoints2) if unmatched[i] and ign[i]])
-	return fp, fn, ig
-
-
-def corresponding_frame(traj1, len1, traj2, len2):
-	"""
-	Find the matching position in traj2 regarding to traj1
-	Assume both trajectories in ascending frame ID
-	"""
-	p1, p2 = 0, 0
-	loc = -1 * np.ones((len1,), dtype=int)
-	while p1 < len1 and p2 < len2:
-		if traj1[p1] < traj2[p2]:
-			loc[p1] = -1
-			p1 += 1
-		elif traj1[p1] == traj2[p2]:
-			loc[p1] = p2
-			p1 += 1
-			p2 += 1
-		else:
-			p2 += 1
-	return loc
-
-
-def compute_overlap(traj1, traj2, matched_pos):
-	"""
-	Compute the loss hit in traj2 regarding to traj1
-	"""
-	overlap = np.zeros((len(matched_pos),), dtype=float)
-	for i in range(len(matched_pos)):
-		if matched_pos[i] == -1:
-			continue
-		else:
-			mask1 = traj1[i][1].mask
-			mask2 = traj2[matched_pos[i]][1].mask
-			iou = rletools.iou([mask1], [mask2], [False])[0][0]
-			overlap[i] = iou
-	return overlap
-
@@ -2,7 +2,9 @@ import PIL.Image as Image
 import numpy as np
 import pycocotools.mask as rletools
 import glob
+import hashlib
 import os
+from multiprocessing.pool import ThreadPool
 
 
 class SegmentedObject:
@@ -12,7 +14,7 @@ class SegmentedObject:
     self.track_id = track_id
 
 
-def load_sequences(path, seqmap):
+def load_sequences(path, seqmap, validate=True, cache_dir=None):
   objects_per_frame_per_sequence = {}
   for seq in seqmap:
     print("Loading sequence", seq)
@@ -21,62 +23,122 @@ def load_sequences(path, seqmap):
     if os.path.isdir(seq_path_folder):
       objects_per_frame_per_sequence[seq] = load_images_for_folder(seq_path_folder)
     elif os.path.exists(seq_path_txt):
-      objects_per_frame_per_sequence[seq] = load_txt(seq_path_txt)
+      objects_per_frame_per_sequence[seq] = load_txt(seq_path_txt, validate=validate, cache_dir=cache_dir)
     else:
       raise Exception( "<exc>Can't find data in directory " + path + "<!exc>")
 
   return objects_per_frame_per_sequence
 
 
-def load_txt(path):
+def load_txt(path, validate=True, cache_dir=None):
+  """
+  Load objects per frame from a MOTS txt file
+
+  validate: check that track ids are unique and masks do not overlap in each frame and that all
+    classes are known; can be disabled for trusted files
+  cache_dir: if given, the parsed file is stored there in binary form and loaded from there as long
+    as the file is not modified
+  """
+  cache_path = _txt_cache_path(path, cache_dir) if cache_dir is not None else None
+  cached_validated = None
+  if cache_path is not None and os.path.exists(cache_path):
+    with np.load(cache_path) as cached:
+      columns = [cached[k] for k in ("frames", "track_ids", "class_ids", "sizes")]
+      counts = cached["counts"].tobytes()
+      offsets = cached["offsets"]
+      cached_validated = bool(cached["validated"])
+    columns.append([counts[start:end] for start, end in zip(offsets[:-1], offsets[1:])])
+    validated = cached_validated
+  else:
+    columns = _parse_txt(path)
+    validated = False
+
+  frames, track_ids, class_ids, sizes, counts = columns
   objects_per_frame = {}
-  track_ids_per_frame = {}  # To check that no frame contains two objects with same id
-  combined_mask_per_frame = {}  # To check that no frame contains overlapping masks
+  for frame, track_id, class_id, (height, width), mask_counts in zip(
+      frames.tolist(), track_ids.tolist(), class_ids.tolist(), sizes.tolist(), counts):
+    mask = {'size': [height, width], 'counts': mask_counts}
+    objects_per_frame.setdefault(frame, []).append(SegmentedObject(mask, class_id, track_id))
+
+  if validate and not validated:
+    _validate_txt(frames, track_ids, class_ids, objects_per_frame)
+    validated = True
+
+  if cache_path is not None and validated != cached_validated:
+    os.makedirs(cache_dir, exist_ok=True)
+    offsets = np.cumsum([0] + [len(c) for c in counts])
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+      np.savez(f, frames=frames, track_ids=track_ids, class_ids=class_ids, sizes=sizes,
+               counts=np.frombuffer(b"".join(counts), dtype=np.uint8), offsets=offsets, validated=validated)
+    os.replace(tmp_path, cache_path)
+
+  return objects_per_frame
+
+
+def _txt_cache_path(path, cache_dir):
+  st = os.stat(path)
+  key = "{}:{}:{}".format(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+  return os.path.join(cache_dir, "{}_{}.npz".format(os.path.basename(path), hashlib.md5(key.encode()).hexdigest()))
+
+
+def _parse_txt(path):
   with open(path, "r") as f:
-    for line in f:
-      line = line.strip()
-      fields = line.split(" ")
+    lines = [line.strip() for line in f]
+  rows = [line.split(" ") for line in lines]
+
+  try:
+    frames = np.array([int(fields[0]) for fields in rows], dtype=np.int64)
+  except ValueError:
+    for line, fields in zip(lines, rows):
       try:
-        frame = int(fields[0])
-      except:
+        int(fields[0])
+      except ValueError:
         raise Exception("<exc>Error in {} in line: {}<!exc>".format(path.split("/")[-1], line))
-      if frame not in objects_per_frame:
-        objects_per_frame[frame] = []
-      if frame not in track_ids_per_frame:
-        track_ids_per_frame[frame] = set()
-      if int(fields[1]) in track_ids_per_frame[frame]:
-        raise Exception("<exc>Multiple objects with track id " + fields[1] + " in frame " + fields[0] + "<!exc>")
-      else:
-        track_ids_per_frame[frame].add(int(fields[1]))
-
-      class_id = int(fields[2])
-      if not(class_id == 1 or class_id == 2 or class_id == 10):
-        raise Exception( "<exc>Unknown object class " + fields[2] + "<!exc>")
-
-      mask = {'size': [int(fields[3]), int(fields[4])], 'counts': fields[5].encode(encoding='UTF-8')}
-      if frame not in combined_mask_per_frame:
-        combined_mask_per_frame[frame] = mask
-      elif rletools.area(rletools.merge([combined_mask_per_frame[frame], mask], intersect=True)) > 0.0:
-        raise Exception( "<exc>Objects with overlapping masks in frame " + fields[0] + "<!exc>")
-      else:
-        combined_mask_per_frame[frame] = rletools.merge([combined_mask_per_frame[frame], mask], intersect=False)
-      objects_per_frame[frame].append(SegmentedObject(
-        mask,
-        class_id,
-        int(fields[1])
-      ))
 
-  return objects_per_frame
+  track_ids = np.array([int(fields[1]) for fields in rows], dtype=np.int64)
+  class_ids = np.array([int(fields[2]) for fields in rows], dtype=np.int64)
+  sizes = np.array([(int(fields[3]), int(fields[4])) for fields in rows], dtype=np.int64).reshape(-1, 2)
+  counts = [fields[5].encode(encoding='UTF-8') for fields in rows]
+  return frames, track_ids, class_ids, sizes, counts
+
+
+def _validate_txt(frames, track_ids, class_ids, objects_per_frame):
+  # To check that no frame contains two objects with same id
+  order = np.lexsort((np.arange(len(frames)), track_ids, frames))
+  repeated = np.zeros(len(frames), dtype=bool)
+  repeated[order[1:]] = (frames[order[1:]] == frames[order[:-1]]) & (track_ids[order[1:]] == track_ids[order[:-1]])
+  if repeated.any():
+    i = np.flatnonzero(repeated)[0]
+    raise Exception("<exc>Multiple objects with track id " + str(track_ids[i]) + " in frame " + str(frames[i]) + "<!exc>")
+
+  unknown = ~np.isin(class_ids, [1, 2, 10])
+  if unknown.any():
+    raise Exception( "<exc>Unknown object class " + str(class_ids[np.flatnonzero(unknown)[0]]) + "<!exc>")
+
+  # To check that no frame contains overlapping masks; with iscrowd the overlap is the
+  # intersection over the area of the first mask, which is positive iff the masks intersect
+  for frame, objects in objects_per_frame.items():
+    if len(objects) < 2:
+      continue
+    masks = [obj.mask for obj in objects]
+    overlaps = np.asarray(rletools.iou(masks, masks, [True] * len(masks)))
+    np.fill_diagonal(overlaps, 0)
+    if (overlaps > 0).any():
+      raise Exception( "<exc>Objects with overlapping masks in frame " + str(frame) + "<!exc>")
 
 
-def load_images_for_folder(path):
+def load_images_for_folder(path, workers=8):
   files = sorted(glob.glob(os.path.join(path, "*.png")))
 
+  # decoding the PNGs and the masks mostly happens outside of the GIL
+  with ThreadPool(max(1, min(workers, len(files)))) as pool:
+    objects = pool.map(load_image, files)
+
   objects_per_frame = {}
-  for file in files:
-    objects = load_image(file)
+  for file, frame_objects in zip(files, objects):
     frame = filename_to_frame_nr(os.path.basename(file))
-    objects_per_frame[frame] = objects
+    objects_per_frame[frame] = frame_objects
 
   return objects_per_frame
 
@@ -88,18 +150,23 @@ def filename_to_frame_nr(filename):
 
 def load_image(filename, id_divisor=1000):
   img = np.array(Image.open(filename))
-  obj_ids = np.unique(img)
+  height, width = img.shape[:2]
+
+  # A stable sort of the pixels in column-major order, as used by pycocos RLE tools, lists the
+  # pixels of each object in ascending order so that its runs can be read off directly
+  flat = img.ravel(order="F")
+  order = np.argsort(flat, kind="stable")
+  sorted_ids = flat[order]
+  starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+  ends = np.r_[starts[1:], len(flat)]
 
   objects = []
-  mask = np.zeros(img.shape, dtype=np.uint8, order="F")  # Fortran order needed for pycocos RLE tools
-  for idx, obj_id in enumerate(obj_ids):
+  for start, end in zip(starts, ends):
+    obj_id = sorted_ids[start]
     if obj_id == 0:  # background
       continue
-    mask.fill(0)
-    pixels_of_elem = np.where(img == obj_id)
-    mask[pixels_of_elem] = 1
     objects.append(SegmentedObject(
-      rletools.encode(mask),
+      _pixels_to_rle(order[start:end], height, width),
       obj_id // id_divisor,
       obj_id
     ))
@@ -107,6 +174,22 @@ def load_image(filename, id_divisor=1000):
   return objects
 
 
+def _pixels_to_rle(pixels, height, width):
+  """
+  Compressed RLE of the mask made of the given ascending column-major pixel indices
+  """
+  breaks = np.flatnonzero(np.diff(pixels) != 1) + 1
+  run_starts = pixels[np.r_[0, breaks]]
+  run_ends = pixels[np.r_[breaks - 1, len(pixels) - 1]] + 1
+  # runs alternate between background and object starting with (possibly empty) background
+  counts = np.empty(2 * len(run_starts) + 1, dtype=np.int64)
+  counts[0::2] = np.r_[run_starts, height * width] - np.r_[0, run_ends]
+  counts[1::2] = run_ends - run_starts
+  if counts[-1] == 0:
+    counts = counts[:-1]
+  return rletools.frPyObjects({'size': [height, width], 'counts': counts.tolist()}, height, width)
+
+
 def load_seqmap(seqmap_filename):
   print("Loading seqmap...")
   seqmap = []
@@ -5,9 +5,17 @@ import os, sys
 import glob
 import colorsys
 import traceback
+import threading
+import queue
+from collections import deque
+from multiprocessing.pool import ThreadPool
 
 
 class Visualizer(object):
+	# subclasses that scale their coordinates by imScale in drawResults set this
+	# so that they draw on the downscaled frame instead of the full resolution one
+	draw_on_scaled = False
+
 	def __init__(self,
 				seqName = None,
 				mode = None,
@@ -48,7 +56,9 @@ class Visualizer(object):
 		displayTime = False,
 		displayName = False,
 		showOccluder = False,
-		fps = 25):
+		fps = 25,
+		workers = 4,
+		queue_size = 32):
 
 		self.showOccluder = showOccluder
 
@@ -91,32 +101,72 @@ class Visualizer(object):
 
 		print ("Output name: %s"%self.outputName)
 		self.colors = self.generate_colors
-		t=0
-
-		for img in sorted(glob.glob(os.path.join(self.image_dir,"*.jpg"))):
-			t+=1
 
-			im = cv2.imread(img,1)
-
-			if not self.mode == "raw":
+		# frames are decoded by a pool of reader threads, drawn here and encoded by a writer thread;
+		# cv2 releases the GIL while decoding, resizing and encoding so the three stages overlap
+		imgs = sorted(glob.glob(os.path.join(self.image_dir,"*.jpg")))
+		reader = ThreadPool(max(1, workers))
+		pending = deque()
+		frames = queue.Queue(maxsize = queue_size)
+		writer_errors = []
+
+		def write_frames():
+			while True:
+				im = frames.get()
+				if im is None:
+					break
 				try:
-					im = self.drawResults(im, t)
+					self.out.write(im)
 				except Exception as e:
-					print(str(traceback.format_exc()))
-			im=cv2.resize(im,(0,0),fx=self.imScale,fy=self.imScale)
-		
-			if displayTime:
-				cv2.putText(im,"%d" % t,(25,50),cv2.FONT_HERSHEY_PLAIN,self.imScale*6,[255, 255, 255], thickness = 3)
-			if displayName:
-				text = "%s: %s" %(self.seqName, displayName)
-				cv2.putText(im, text,(25,height - 25 ),cv2.FONT_HERSHEY_DUPLEX,self.imScale* 2,[255, 255, 255],  thickness = 2)
-
-			if t == 1:
-				cv2.imwrite("{}.jpg".format(self.outputNameNoExt), im)
-				im_mini = cv2.resize(im, (0,0), fx=0.25, fy=0.25)
-				cv2.imwrite("{}-mini.jpg".format(self.outputNameNoExt), im_mini)
-			self.out.write(im)
+					writer_errors.append(e)
+
+		writer = threading.Thread(target = write_frames)
+		writer.daemon = True
+		writer.start()
+
+		try:
+			# read ahead at most queue_size frames so that memory stays bounded
+			for img in imgs[:queue_size]:
+				pending.append(reader.apply_async(cv2.imread, (img, 1)))
+			next_img = len(pending)
+
+			t=0
+			while pending:
+				im = pending.popleft().get()
+				if next_img < len(imgs):
+					pending.append(reader.apply_async(cv2.imread, (imgs[next_img], 1)))
+					next_img += 1
+				t+=1
+
+				if self.draw_on_scaled:
+					im=cv2.resize(im,(0,0),fx=self.imScale,fy=self.imScale)
+				if not self.mode == "raw":
+					try:
+						im = self.drawResults(im, t)
+					except Exception as e:
+						print(str(traceback.format_exc()))
+				if not self.draw_on_scaled:
+					im=cv2.resize(im,(0,0),fx=self.imScale,fy=self.imScale)
+
+				if displayTime:
+					cv2.putText(im,"%d" % t,(25,50),cv2.FONT_HERSHEY_PLAIN,self.imScale*6,[255, 255, 255], thickness = 3)
+				if displayName:
+					text = "%s: %s" %(self.seqName, displayName)
+					cv2.putText(im, text,(25,height - 25 ),cv2.FONT_HERSHEY_DUPLEX,self.imScale* 2,[255, 255, 255],  thickness = 2)
+
+				if t == 1:
+					cv2.imwrite("{}.jpg".format(self.outputNameNoExt), im)
+					im_mini = cv2.resize(im, (0,0), fx=0.25, fy=0.25)
+					cv2.imwrite("{}-mini.jpg".format(self.outputNameNoExt), im_mini)
+				frames.put(im)
+		finally:
+			frames.put(None)
+			writer.join()
+			reader.close()
+			reader.join()
 		self.out.release()
+		if writer_errors:
+			raise writer_errors[0]
 
 		print("Finished: %s"%self.outputName)
 		if not len(extensions)==0:
@@ -124,6 +174,29 @@ class Visualizer(object):
 			self.convertVideo(extensions)
 	def drawResults(self, image = None):
 		NotImplemented
+
+	def blendRect(self, im, pt1, pt2, color, alpha):
+		"""
+		Blend a filled rectangle into the image; only the pixels covered by the rectangle are touched
+		instead of blending a full copy of the image
+		"""
+		left, top = max(pt1[0], 0), max(pt1[1], 0)
+		right, bottom = min(pt2[0] + 1, im.shape[1]), min(pt2[1] + 1, im.shape[0])
+		if left >= right or top >= bottom:
+			return im
+		roi = im[top:bottom, left:right]
+		overlay = np.empty_like(roi)
+		overlay[:] = color
+		roi[:] = cv2.addWeighted(overlay, alpha, roi, 1 - alpha, 0)
+		return im
+
+	def indexFrames(self, frames):
+		"""
+		Map each frame number to the indices of the rows that belong to it
+		"""
+		order = np.argsort(frames, kind = "mergesort")
+		keys, starts = np.unique(frames[order], return_index = True)
+		return dict(zip(keys.astype(int), np.split(order, starts[1:])))
 	def load(self):
 		NotImplemented
 
@@ -24,6 +24,9 @@ class Camera:
         self.t = None    # Extrinsic camera translation
         self.plane = None # Water interface
         self.roi = None
+        self.rotInv = None      # Cached inverse of the rotation matrix
+        self.planeOrigin = None # Cached camera position projected onto the water interface
+        self.planeX = None      # Cached x direction of the refraction planes
 
         if(intrinsicPath is not None):
             self.K, self.dist = self.loadIntrinsic(intrinsicPath)
@@ -73,15 +76,48 @@ class Camera:
             Boolean on whether the 2D point is within the region of interest
         """
         
+        return bool(self.withinRoiPoints([x], [y])[0])
+
+
+    def withinRoiPoints(self, x, y):
+        """
+        Checks whether N 2D points are within the camera ROI
+        
+        Input:
+            x: array with the x coordinates of the 2D points
+            y: array with the y coordinates of the 2D points
+            
+        Output:
+            Boolean array on whether each 2D point is within the region of interest
+        """
+        
+        x = np.asarray(x, dtype=float).flatten()
+        y = np.asarray(y, dtype=float).flatten()
         if(self.roi is None or self.K is None):
-            return True
+            return np.ones(len(x), dtype=bool)
         
-        p1 = cv2.undistortPoints(np.array([[[x,y]]]), self.K, self.dist).flatten()
-        if(p1[0] < self.roi['x'][0] or p1[0] > self.roi['x'][1]):
-            return False
-        if(p1[1] < self.roi['y'][0] or p1[1] > self.roi['y'][1]):
-            return False
-        return True
+        p1 = self.undistortPoints(x, y)
+        return ((p1[:,0] >= self.roi['x'][0]) & (p1[:,0] <= self.roi['x'][1]) &
+                (p1[:,1] >= self.roi['y'][0]) & (p1[:,1] <= self.roi['y'][1]))
+
+
+    def undistortPoints(self, x, y):
+        """
+        Undistorts N 2D points with a single OpenCV call
+        
+        Input:
+            x: array with the x coordinates of the 2D points
+            y: array with the y coordinates of the 2D points
+            
+        Output:
+            points: N x 2 array with the normalized undistorted points
+        """
+        
+        points = np.stack([np.asarray(x, dtype=float).flatten(),
+                           np.asarray(y, dtype=float).flatten()], axis=1)
+        if(len(points) == 0):
+            return np.zeros((0,2))
+        return cv2.undistortPoints(points.reshape(-1,1,2), self.K, self.dist).reshape(-1,2)
         
 
     def backprojectPoint(self, x, y):
@@ -97,6 +133,26 @@ class Camera:
             ray0:
         """
         
+        res = self.backprojectPoints([x], [y])
+        if(res is None):
+            return
+        rays, ray0 = res
+        return rays[0], ray0
+
+
+    def backprojectPoints(self, x, y):
+        """
+        Backproject N 2D points into 3D rays i.e. finds R = R^-1 K^-1 [x y 1]^T for each point
+        
+        Input:
+            x: array with the x coordinates of the 2D points
+            y: array with the y coordinates of the 2D points
+        
+        Output:
+            rays: N x 3 array with the normalized ray directions
+            ray0: the camera center, which all rays go through
+        """
+        
         if(self.R is None or self.t is None):
             print("Camera: Error - Extrinsic parameters is needed to back-project a point")
             return
@@ -105,17 +161,16 @@ class Camera:
             return
         
         # Calculate R = K^-1 [x y 1]^T and account for distortion
-        ray = cv2.undistortPoints(np.array([[[x,y]]]), self.K, self.dist)
-        ray = ray[0][0] # Unwrap point from array of array
-        ray = np.array([ray[0], ray[1], 1.0])
+        rays = self.undistortPoints(x, y)
+        rays = np.concatenate((rays, np.ones((len(rays),1))), axis=1)
         
         # Calculate R^-1 R
-        ray = np.dot(np.linalg.inv(self.rot), ray)
-        ray /= np.linalg.norm(ray)
+        rays = np.dot(rays, self.rotInv.T)
+        rays /= np.linalg.norm(rays, axis=1, keepdims=True)
 
         # Calculate camera center, i.e. -R^-1 t
         ray0 = self.pos
-        return ray, ray0
+        return rays, ray0
 
 
     def forwardprojectPoint(self, x, y, z, correctRefraction=True, verbose=False):
@@ -133,49 +188,65 @@ class Camera:
             point: 2D point on the camera plane
         """
         
+        return self.forwardprojectPoints([x], [y], [z], correctRefraction=correctRefraction, verbose=verbose)[0]
+
+
+    def forwardprojectPoints(self, x, y, z, correctRefraction=True, verbose=False):
+        """
+        Forwards project N 3D points onto the camera plane
+        
+        Input:
+            x: array with the x coordinates of the 3D points
+            y: array with the y coordinates of the 3D points
+            z: array with the z coordinates of the 3D points
+            correctRefraction: Whether to correct for refraction when projecting
+            verbose: Whether to write information when correcting for refraction
+            
+        Output:
+            points: N x 2 array with the 2D points on the camera plane; points for which
+                    the refraction could not be solved are NaN
+        """
+        
+        p1 = np.stack([np.asarray(x, dtype=float).flatten(),
+                       np.asarray(y, dtype=float).flatten(),
+                       np.asarray(z, dtype=float).flatten()], axis=1)
+        if(len(p1) == 0):
+            return np.zeros((0,2))
+        
         if(correctRefraction is False):
-            p3 = cv2.projectPoints(np.array([[[x,y,z]]]), self.R, self.t, self.K, self.dist)[0]
-            return p3.flatten()
+            p3 = cv2.projectPoints(p1.reshape(-1,1,3), self.R, self.t, self.K, self.dist)[0]
+            return p3.reshape(-1,2)
         
-        p1 = np.array([x,y,z])
         c1 = self.pos.flatten()
         w = self.plane.normal
         
-        # 1) Plane between p1 and c1, perpendicular to w
+        # 1) Planes between each p1 and c1, perpendicular to w
         n = np.cross((p1-c1), w)
         if(verbose):
-            print("Plane normal: {0}".format(n))
+            print("Plane normals: {0}".format(n))
 
         # 2) Find plane origin and x/y directions
         #    i.e. project camera position onto refraction plane
-        p0 = self.plane.intersectionWithRay(-w, c1)        
-        if(verbose):
-            print("Plane origin: {0}".format(p0))
-
-        pX = c1-p0
-        pX = pX / np.linalg.norm(pX)
+        #    (the origin and x direction do not depend on the point and are cached)
+        p0 = self.planeOrigin
+        pX = self.planeX
         pY = np.cross(n, pX)
-        pY = pY / np.linalg.norm(pY)
+        pY = pY / np.linalg.norm(pY, axis=1, keepdims=True)
         if(verbose):
+            print("Plane origin: {0}".format(p0))
             print("Plane x direction: {0}".format(pX))
-            print("Plane y direction: {0}".format(pY))
-            print("Direction dot check: \n{0}\n{1}\n{2}".format(np.dot(pX,pY),
-                                                                np.dot(n,pX),
-                                                                np.dot(n,pY)))
-
-        # 3) Project 3d position and camera position onto 2D plane
-        p1_proj = np.array([np.dot(pX, p1-p0),
-                            np.dot(pY, p1-p0)])
-        c1_proj = np.array([np.dot(pX, c1-p0),
-                            np.dot(pY, c1-p0)])
+            print("Plane y directions: {0}".format(pY))
+
+        # 3) Project 3d positions and camera position onto the 2D planes
+        sx = np.dot(p1-p0, pX)
+        sy = np.sum(pY * (p1-p0), axis=1)
+        e = np.dot(pX, c1-p0)
         if(verbose):
-            print("P1 projection: {0}".format(p1_proj)) 
-            print("C1 projection: {0}".format(c1_proj))
+            print("P1 projections: {0}".format(np.stack([sx, sy], axis=1)))
+            print("C1 projection: {0}".format(e))
 
-        # 4) Construct 4'th order polynomial
-        sx = p1_proj[0]
-        sy = p1_proj[1]
-        e = c1_proj[0]
+        # 4) Construct 4'th order polynomials and solve them all at once through the eigenvalues
+        #    of their companion matrices (which is what np.roots does for a single polynomial)
         r = 1.33
         N = (1/r**2) - 1
 
@@ -185,31 +256,31 @@ class Camera:
         y1 = 2 * e**2 * sy
         y0 = -e**2 * sy**2
 
-        coeffs = [y4, y3, y2, y1, y0]
-        res = np.roots(coeffs)
-        
-        real = np.real(res)
-        resRange = (min(1e-6,sy),max(1e-6,sy))
-
-        finalRes = []
-        for r in real:
-            if(r > resRange[0] and r < resRange[1]):                
-                finalRes.append(r)
-        finalRes = finalRes[np.argmax([abs(x) for x in finalRes])]
-        refPoint = (finalRes*pY)+p0
+        companion = np.zeros((len(p1),4,4))
+        companion[:,0,:] = -np.stack([y3, y2, y1, y0], axis=1) / y4
+        companion[:,1,0] = 1
+        companion[:,2,1] = 1
+        companion[:,3,2] = 1
+        real = np.real(np.linalg.eigvals(companion))
+
+        # Keep the root with the largest magnitude within the range of each point
+        resLow = np.minimum(1e-6, sy)[:,None]
+        resHigh = np.maximum(1e-6, sy)[:,None]
+        valid = (real > resLow) & (real < resHigh)
+        best = np.argmax(np.where(valid, np.abs(real), -1), axis=1)
+        finalRes = real[np.arange(len(p1)), best]
+        finalRes[~valid.any(axis=1)] = np.nan
+        refPoint = (finalRes[:,None]*pY)+p0
             
         if(verbose):
             print("\n")
             print("4th order poly details:")
-            print(" - Range: {0}".format(resRange))
             print(" - Roots: {0}".format(real))
             print(" - finalRes: {0}".format(finalRes))
-            print(" - pY: {0}".format(pY))
-            print(" - p0: {0}".format(p0))
-            print(" - Intersection point: {0}".format(refPoint))
+            print(" - Intersection points: {0}".format(refPoint))
 
-        p3 = cv2.projectPoints(np.array([[[*refPoint]]]), self.R, self.t, self.K, self.dist)[0]
-        return p3.flatten()
+        p3 = cv2.projectPoints(refPoint.reshape(-1,1,3), self.R, self.t, self.K, self.dist)[0]
+        return p3.reshape(-1,2)
         
 
     def getExtrinsicMat(self):
@@ -431,6 +502,21 @@ class Camera:
 
         self.rot = cv2.Rodrigues(self.R)[0]
         self.pos = self.getPosition()
+        self.cacheProjection()
+
+
+    def cacheProjection(self):
+        """
+        Caches the values that the projection functions need for every point:
+        the inverse rotation and the origin and x direction of the refraction planes,
+        i.e. the camera position projected onto the water surface
+        """
+        
+        self.rotInv = np.linalg.inv(self.rot)
+        c1 = self.pos.flatten()
+        self.planeOrigin = self.plane.intersectionWithRay(-self.plane.normal, c1)
+        self.planeX = c1-self.planeOrigin
+        self.planeX = self.planeX / np.linalg.norm(self.planeX)
     
     
     def calcExtrinsic(self, worldPoints, cameraPoints, method=cv2.SOLVEPNP_ITERATIVE):
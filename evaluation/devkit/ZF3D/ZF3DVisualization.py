@@ -46,17 +46,18 @@ class ZF3DVisualizer(Visualizer):
 
                 curr_frame = self.resFile[self.resFile["frame"] == t]
 
-                targets = list(curr_frame["id"].unique())
-                for targetID in targets:
+                # Project the 3D detections of the frame into the camera planes (2D) at once
+                x_world = curr_frame["3d_x"].values
+                y_world = curr_frame["3d_y"].values
+                z_world = curr_frame["3d_z"].values
+                camT_pts = self.camT.forwardprojectPoints(x_world, y_world, z_world)
+                camF_pts = self.camF.forwardprojectPoints(x_world, y_world, z_world)
+
+                for targetID, camT_pt, camF_pt in zip(curr_frame["id"].values, camT_pts, camF_pts):
                         IDstr = "%d" % targetID
-                        curr_target = curr_frame[curr_frame["id"] == targetID]
-
-                        # Project 3D detections into the camera planes (2D)
-                        x_world = np.float(curr_target["3d_x"])
-                        y_world = np.float(curr_target["3d_y"])
-                        z_world = np.float(curr_target["3d_z"])
-                        camT_pt = self.camT.forwardprojectPoint(x_world, y_world, z_world)
-                        camF_pt = self.camF.forwardprojectPoint(x_world, y_world, z_world)
+                        # Skip points for which the refraction could not be solved
+                        if not (np.isfinite(camT_pt).all() and np.isfinite(camF_pt).all()):
+                                continue
 
                         # Shift camF point (front-view camera) to account for side-by-side view
                         camT_pt[0] += im.shape[1]/2
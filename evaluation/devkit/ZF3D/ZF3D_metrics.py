@@ -4,7 +4,6 @@ E-mail author: mape@create.aau.dk
 Last Modified: May 7 2020
 """
 
-import math
 import pandas as pd
 import motmetrics as mm
 import numpy as np
@@ -178,6 +177,10 @@ class Zef_3dMetrics(Metrics):
         gt_df = gt_df.dropna(subset=["3d_x", "3d_y", "3d_z"])
         det_df = det_df[(det_df["3d_x"] > 0)  &  (det_df["3d_y"] > 0)  &  (det_df["3d_z"] > 0)]
 
+        # Sort both tables by frame once so the entries of each frame are a contiguous slice
+        gt_df = gt_df.sort_values(gt_frame_col, kind="mergesort")
+        det_df = det_df.sort_values(det_frame_col, kind="mergesort")
+
         # Get unique occurring frames
         gt_frames = gt_df[gt_frame_col].unique()
         det_frames = det_df[det_frame_col].unique()
@@ -186,20 +189,23 @@ class Zef_3dMetrics(Metrics):
         det_frames = [int(x) for x in det_frames]
         print( "det num frames")
 
-        frames = list(set(gt_frames+det_frames))
+        frames = sorted(set(gt_frames+det_frames))
 
         print("[Seq {}]\nAmount of GT frames: {}\nAmount of det frames: {}\nSet of all frames: {}".format(sequence, len(gt_frames), len(det_frames), len(frames)))
 
+        gt_bounds = np.stack([np.searchsorted(gt_df[gt_frame_col].values, frames, side=side) for side in ("left", "right")], axis=1)
+        det_bounds = np.stack([np.searchsorted(det_df[det_frame_col].values, frames, side=side) for side in ("left", "right")], axis=1)
+
         acc = mm.MOTAccumulator(auto_id=False)
 
         dist_sum = 0
 
         try:
-            for frame in frames:
+            for frame, (gt_start, gt_end), (det_start, det_end) in zip(frames, gt_bounds, det_bounds):
 
                 # Get the df entries for this specific frame
-                gts = gt_df[gt_df[gt_frame_col] == frame]
-                dets = det_df[det_df[det_frame_col] == frame]
+                gts = gt_df.iloc[gt_start:gt_end]
+                dets = det_df.iloc[det_start:det_end]
 
                 gt_data = True
                 det_data = True
@@ -207,7 +213,6 @@ class Zef_3dMetrics(Metrics):
                 # Get ground truth positions, if any
                 if len(gts) > 0:
                     gt_pos, gt_ids = posFunc(gts)
-                    gt_ids = [x for x in gt_ids]
                 else:
                     gt_ids = []
                     gt_data = False
@@ -215,16 +220,15 @@ class Zef_3dMetrics(Metrics):
                 # Get detections, if any
                 if len(dets) > 0:
                     det_pos, det_ids = posFunc(dets)
-                    det_ids = [x for x in det_ids]
                 else:
                     det_ids = []
                     det_data = False
 
                 # Get the L2 distance between ground truth positions, and the detections
                 if gt_data and det_data:
-                    dist = distFunc(gt_pos, det_pos, maxDist=maxDist).tolist()
+                    dist = distFunc(gt_pos, det_pos, maxDist=maxDist)
                 else:
-                    dist = []
+                    dist = np.empty((len(gt_ids), len(det_ids)))
 
                 # Update accumulator
                 acc.update(gt_ids,              # Ground truth objects in this frame
@@ -232,7 +236,7 @@ class Zef_3dMetrics(Metrics):
                         dist,                   # Distance between ground truths and observations
                         frame)
 
-                dist_sum += self.nestedSum(dist)
+                dist_sum += np.nansum(dist)
         except:
             print("Add some more information for the exception here.") # FIX
             raise Exception("<exc> Evaluation failed <!exc>")
@@ -285,20 +289,6 @@ class Zef_3dMetrics(Metrics):
         # total number of frames
         self.total_num_frames = int(metrics["num_frames"])
 
-    def nestedSum(self, x):
-        """
-        Returns the summed elements in nested lists
-        """
-        total = 0
-        for i in x:
-            if isinstance(i, list):
-                total += self.nestedSum(i)
-            elif not math.isnan(i):
-                total += i
-            else:
-                pass
-        return total
-
     def get3Dpos(self, df):
         """
         Returns the 3D position in a dataset
@@ -310,15 +300,9 @@ class Zef_3dMetrics(Metrics):
             pos: Numpy array of size [n_ids, 3] containing the 3d position
             ids: List of IDs
         """
-        ids = df["id"].unique()
-        ids = [int(x) for x in ids]
-
-        pos = np.zeros((len(ids), 3))
-        for idx, identity in enumerate(ids):
-            df_id = df[df["id"] == identity]
-            pos[idx,0] = df_id["3d_x"]
-            pos[idx,1] = df_id["3d_y"]
-            pos[idx,2] = df_id["3d_z"]
+        first = ~df["id"].duplicated().values
+        ids = [int(x) for x in df["id"].values[first]]
+        pos = df[["3d_x", "3d_y", "3d_z"]].values[first].astype(float)
 
         return pos, ids
 
@@ -332,11 +316,7 @@ class Zef_3dMetrics(Metrics):
 
         assert X_dim == Y_dim, "The two provided matrices not have observations of the same dimensionality"
 
-        mat = np.zeros((X_ele, Y_ele))
-
-        for row, posX in enumerate(X):
-            for col, posY in enumerate(Y):
-                mat[row, col] = np.linalg.norm(posX-posY)
+        mat = np.sqrt(mm.distances.norm2squared_matrix(X, Y, max_d2=maxDist**2))
 
         mat[mat > maxDist] = np.nan
 
@@ -388,46 +368,31 @@ class Zef_3dMetrics(Metrics):
             events: Pandas Dataframe structured as per the motmetrics package
 
         Output:
-            MTBF_s: The Standard MTBF metric proposed in the original paper
-            MTBF_m: The monotonic MTBF metric proposed in the original paper
+            mtbf_ssum: Total length of the successfully tracked sequences
+            mtbf_slen: Number of successfully tracked sequences
+            mtbf_nslen: Number of null sequences, i.e. sequences of failures
+
+            The standard and monotonic MTBF proposed in the original paper are
+            mtbf_ssum / mtbf_slen and mtbf_ssum / (mtbf_slen + mtbf_nslen)
         """
 
-        unique_gt_ids = events.OId.unique()
-        seqs = []
-        null_seqs = []
-        for gt_id in unique_gt_ids:
-            gt_events = events[events.OId == gt_id]
-
-            counter = 0
-            null_counter = 0
-
-            for _, row in gt_events.iterrows():
-                if row["Type"] == "MATCH":
-                    counter += 1
-                elif row["Type"] == "SWITCH":
-                    seqs.append(counter)
-                    counter = 1
-                else:
-                    seqs.append(counter)
-                    counter = 0
-                    null_counter = 1
-
-                if counter > 0:
-                    if null_counter > 0:
-                        null_seqs.append(null_counter)
-                        null_counter = 0
-
-            if counter > 0:
-                seqs.append(counter)
-            if null_counter > 0:
-                null_seqs.append(null_counter)
-
-        seqs = np.asarray(seqs)
-        seqs = seqs[seqs>0]
-
-        mtbf_ssum = sum(seqs)
-        mtbf_slen = len(seqs)
-        mtbf_nslen = len(null_seqs)
+        # Group the events per ground truth id; the stable sort keeps each group in event order
+        oids, _ = pd.factorize(events["OId"].values)
+        order = np.argsort(oids, kind="mergesort")[np.count_nonzero(oids < 0):]
+        oids = oids[order]
+        success = events["Type"].isin(["MATCH", "SWITCH"]).values[order]
+        switch = (events["Type"] == "SWITCH").values[order]
+
+        group_start = np.ones(len(oids), dtype=bool)
+        group_start[1:] = oids[1:] != oids[:-1]
+        prev_success = np.ones(len(oids), dtype=bool)
+        prev_success[1:] = success[:-1]
+
+        # A sequence starts with every success that begins a group, follows a failure or is
+        # a switch, and a null sequence with every failure that begins a group or follows a success
+        mtbf_ssum = np.count_nonzero(success)
+        mtbf_slen = np.count_nonzero(success & (group_start | ~prev_success | switch))
+        mtbf_nslen = np.count_nonzero(~success & (group_start | prev_success))
 
         if mtbf_ssum == 0:
             return 0, 0, 0
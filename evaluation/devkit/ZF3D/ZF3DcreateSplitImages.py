@@ -6,40 +6,82 @@ from ZF3D.Camera import Camera
 import glob
 import os
 import cv2
+import multiprocessing as mp
 import numpy as np
 import pandas as pd
 
 
 
-def genSplitViewImages(image_dir):
+def splitViewImage(args):
     """
-    Create image folder and generate split-view images
+    Generate the split-view image of a single frame
+
+    Returns the name of the frame or None if its image could not be written
     """
 
+    imgF_path, imgT_path, output_file = args
+
+    imgF = cv2.imread(imgF_path)
+    imgT = cv2.imread(imgT_path)
+
+    splitImg = np.hstack((imgF,imgT))
+
+    if not cv2.imwrite(output_file,splitImg):
+        print("Failed to write {}".format(output_file))
+        return None
+    return os.path.basename(output_file)
 
 
+def genSplitViewImages(image_dir, processes=None):
+    """
+    Create image folder and generate split-view images
+
+    The frames are generated by a pool of processes. The names of the finished frames are
+    appended to a manifest in the output folder so that a rerun only has to handle new frames;
+    if there is no manifest yet, frames that already exist are considered finished.
+    """
 
     imgF_dir = os.path.join(image_dir, 'imgF')
     imgT_dir = os.path.join(image_dir, 'imgT')
     output_dir = os.path.join(image_dir, 'img1')
+    manifest_path = os.path.join(output_dir, 'manifest.txt')
     if not os.path.exists(output_dir):
             os.makedirs(output_dir)
-    for frame in os.listdir(imgF_dir):
-        if frame.endswith(".jpg"):
-            f = os.path.split(frame)[-1]
 
-            output_file = os.path.join(output_dir,f)
-            
-            if os.path.exists(output_file):
-                    continue
+    frames = sorted(f for f in os.listdir(imgF_dir) if f.endswith(".jpg"))
 
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as fid:
+            done = set(fid.read().split())
+    else:
+        done = set(f for f in frames if os.path.exists(os.path.join(output_dir,f)))
+        with open(manifest_path, 'w') as fid:
+            fid.write("".join("{}\n".format(f) for f in sorted(done)))
 
-            imgF = cv2.imread(os.path.join(imgF_dir,f))
-            imgT = cv2.imread(os.path.join(imgT_dir,f))
+    jobs = [(os.path.join(imgF_dir,f), os.path.join(imgT_dir,f), os.path.join(output_dir,f))
+            for f in frames if f not in done]
+    if not jobs:
+        return
 
-            splitImg = np.hstack((imgF,imgT))
+    if processes is None:
+        processes = mp.cpu_count()
+    processes = max(1, min(processes, len(jobs)))
 
-            cv2.imwrite(output_file,splitImg)
+    # a frame is only recorded once its image has been written so failed frames are retried by a rerun
+    with open(manifest_path, 'a') as fid:
+        if processes == 1:
+            for job in jobs:
+                f = splitViewImage(job)
+                if f is not None:
+                    fid.write("{}\n".format(f))
+        else:
+            with mp.Pool(processes) as p:
+                for f in p.imap_unordered(splitViewImage, jobs, chunksize=8):
+                    if f is not None:
+                        fid.write("{}\n".format(f))
+                        fid.flush()
+                p.close()
+                p.join()
 
 
 if __name__ == "__main__":
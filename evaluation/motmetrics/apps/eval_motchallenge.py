@@ -47,7 +47,9 @@ string.""", formatter_class=argparse.RawTextHelpFormatter)
     parser.add_argument('tests', type=str, help='Directory containing tracker result files')
     parser.add_argument('--loglevel', type=str, help='Log level', default='info')
     parser.add_argument('--fmt', type=str, help='Data format', default='mot15-2D')
-    parser.add_argument('--solver', type=str, help='LAP solver to use')
+    parser.add_argument('--solver', type=str, help='LAP solver to use, \'auto\' picks the fastest one by problem size')
+    parser.add_argument('--jobs', type=int, help='Number of processes for computing metrics; 0 uses all cores',
+                        default=1)
     return parser.parse_args()
 
 def compare_dataframes(gts, ts):
@@ -91,6 +93,7 @@ if __name__ == '__main__':
     
     logging.info('Running metrics')
     
-    summary = mh.compute_many(accs, names=names, metrics=mm.metrics.motchallenge_metrics, generate_overall=True)
+    summary = mh.compute_many(accs, names=names, metrics=mm.metrics.motchallenge_metrics, generate_overall=True,
+                               jobs=args.jobs)
     print(mm.io.render_summary(summary, formatters=mh.formatters, namemap=mm.io.motchallenge_metric_names))
     logging.info('Completed')
\ No newline at end of file
@@ -36,13 +36,17 @@ def norm2squared_matrix(objs, hyps, max_d2=float('inf')):
         return np.empty((0,0))
 
     assert hyps.shape[1] == objs.shape[1], "Dimension mismatch"
-    
-    C = np.empty((objs.shape[0], hyps.shape[0]))
-        
-    for o in range(objs.shape[0]):
-        for h in range(hyps.shape[0]):
-            e = objs[o] - hyps[h]
-            C[o, h] = e.dot(e)
+
+    # ||o - h||^2 = ||o||^2 + ||h||^2 - 2 o.h lets the cross term use a single matrix product;
+    # rounding can make it slightly negative for (nearly) coincident points
+    norms = np.square(objs).sum(axis=1)[:, np.newaxis] + np.square(hyps).sum(axis=1)[np.newaxis, :]
+    C = norms - 2 * objs.dot(hyps.T)
+    np.maximum(C, 0, out=C)
+
+    if np.isfinite(max_d2):
+        # pairs within rounding error of the threshold are decided on their exact differences
+        r, c = np.nonzero(np.abs(C - max_d2) <= 8 * np.finfo(float).eps * norms)
+        C[r, c] = np.square(objs[r] - hyps[c]).sum(axis=1)
 
     C[C > max_d2] = np.nan
     return C
@@ -1,11 +1,18 @@
 import numpy as np
 from collections import OrderedDict
 
-def linear_sum_assignment(costs, solver=None):
+def linear_sum_assignment(costs, solver=None, decompose=True):
     """Solve a linear sum assignment problem (LSA).
 
     For large datasets solving the minimum cost assignment becomes the dominant runtime part. 
-    We therefore support various solvers out of the box (currently lapsolver, scipy, ortools, munkres)
+    We therefore support various solvers out of the box (currently lapsolver, lap, scipy, ortools, munkres)
+    and ship a NumPy implementation of the Jonker-Volgenant algorithm that is always available.
+
+    Unless disabled, the solver is skipped when every connected component of the bipartite graph
+    formed by the finite entries of `costs` has a single row or column, as is the case for large
+    mostly empty matrices. Since no pair can be assigned across components, each of them is then
+    solved directly by picking its minimum cost entry. Solvers may break ties differently, so this
+    is only done if each of these minima is unique; any other matrix is passed to the solver as it is.
     
     Params
     ------
@@ -16,9 +23,18 @@ def linear_sum_assignment(costs, solver=None):
     Kwargs
     ------
     solver : callable or str, optional
-        When str: name of solver to use.
+        When str: name of solver to use; 'auto' picks the fastest available solver by size
         When callable: function to invoke
         When None: uses first available solver
+    decompose : bool, optional
+        Solve matrices whose components of assignable pairs all have a single row or
+        column without calling the solver. Defaults to true.
+
+    Returns
+    -------
+    rids, cids : np.array
+        Row and column indices of the assigned pairs sorted by row index. Depending on
+        the solver, pairs with non-finite costs may be included.
     """
 
     solver = solver or default_solver
@@ -28,7 +44,80 @@ def linear_sum_assignment(costs, solver=None):
         solver = solver_map.get(solver, None)    
     
     assert callable(solver), 'Invalid LAP solver.'
-    return solver(costs)
+
+    if not decompose:
+        return solver(costs)
+
+    costs = np.asarray(costs)
+    if costs.ndim != 2 or costs.size == 0:
+        return solver(costs)
+
+    finite = np.isfinite(costs)
+    row_degrees = finite.sum(axis=1)
+    col_degrees = finite.sum(axis=0)
+
+    # a component has several rows and several columns iff one of its entries is in a row
+    # and in a column that both have several finite entries
+    star_rows = row_degrees > 1
+    star_cols = col_degrees > 1
+    if (finite[star_rows][:, star_cols]).any():
+        return solver(costs)
+
+    masked = np.where(finite, costs, np.inf)
+
+    # rows that are the only row of their component, including 1x1 ones
+    rows = np.flatnonzero((row_degrees > 0) & ~finite[:, star_cols].any(axis=1))
+    row_costs = masked[rows]
+    row_cids = np.argmin(row_costs, axis=1)
+    row_mins = row_costs[np.arange(rows.size), row_cids]
+
+    # columns that are the only column of their component and have more than one row
+    cols = np.flatnonzero(star_cols)
+    col_costs = masked[:, cols]
+    col_rids = np.argmin(col_costs, axis=0)
+    col_mins = col_costs[col_rids, np.arange(cols.size)]
+
+    # the solvers break ties differently, so tied minima are left to them
+    if (np.count_nonzero(row_costs == row_mins[:, None], axis=1) > 1).any() or \
+            (np.count_nonzero(col_costs == col_mins[None, :], axis=0) > 1).any():
+        return solver(costs)
+
+    rids = np.concatenate([rows, col_rids]).astype(np.int64)
+    cids = np.concatenate([row_cids, cols]).astype(np.int64)
+    order = np.argsort(rids, kind='mergesort')
+    return rids[order], cids[order]
+
+def bipartite_components(rows, cols, n_rows, n_cols):
+    """Label the connected components of a bipartite graph given by its edges.
+
+    Params
+    ------
+    rows, cols : np.array
+        Row and column node of each edge
+    n_rows, n_cols : int
+        Number of row and column nodes
+
+    Returns
+    -------
+    row_labels, col_labels : np.array
+        Component label of each row and column node. Nodes of the same component share the
+        smallest index of their component in the combined row-then-column node numbering.
+    """
+
+    u = np.asarray(rows, dtype=np.int64)
+    v = np.asarray(cols, dtype=np.int64) + n_rows
+    labels = np.arange(n_rows + n_cols)
+    while True:
+        edge_labels = np.minimum(labels[u], labels[v])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, u, edge_labels)
+        np.minimum.at(new_labels, v, edge_labels)
+        # pointer jumping: labels always point to nodes of the same component
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels[:n_rows], labels[n_rows:]
 
 def lsa_solve_scipy(costs):
     """Solves the LSA problem using the scipy library."""
@@ -111,13 +200,13 @@ def lsa_solve_ortools(costs):
     f = 10**abs(e)
 
     assignment = pywrapgraph.LinearSumAssignment()
-    for r in range(costs.shape[0]):
-        for c in range(costs.shape[1]):
-            if valid[r,c]:
-                assignment.AddArcWithCost(r, c, int(costs[r,c]*f))
+    rows, cols = np.nonzero(valid)
+    arc_costs = (costs[rows, cols]*f).astype(np.int64)
+    for r, c, cost in zip(rows.tolist(), cols.tolist(), arc_costs.tolist()):
+        assignment.AddArcWithCost(r, c, cost)
     
     if assignment.Solve() != assignment.OPTIMAL:
-        return linear_sum_assignment(costs, solver='scipy')
+        return lsa_solve_scipy(costs)
 
     if assignment.NumNodes() == 0:
         return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
@@ -144,29 +233,178 @@ def lsa_solve_lapjv(costs):
     indices = indices[indices[:, 1] != -1]
     return indices[:,0], indices[:,1]
 
+def lsa_solve_jv(costs):
+    """Solves the LSA problem using the built-in shortest augmenting path solver.
+
+    This is a NumPy implementation of the Jonker-Volgenant algorithm as described in
+    Crouse, "On implementing 2D rectangular assignment algorithms" (2016). Each row is
+    augmented along a shortest path found by a Dijkstra-like search whose inner loop
+    over the columns is vectorized. It has no dependencies beyond NumPy and is therefore
+    always available.
+    """
+
+    costs = np.asarray(costs, dtype=np.float64)
+    if costs.size == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    inv = ~np.isfinite(costs)
+    if inv.any():
+        costs = costs.copy()
+        valid = costs[~inv]
+        INVDIST = 2 * valid.max() + 1 if valid.shape[0] > 0 else 1.
+        costs[inv] = INVDIST
+
+    transposed = costs.shape[0] > costs.shape[1]
+    if transposed:
+        costs = costs.T
+
+    n_rows, n_cols = costs.shape
+    u = np.zeros(n_rows)
+    v = np.zeros(n_cols)
+    col4row = np.full(n_rows, -1, dtype=np.int64)
+    row4col = np.full(n_cols, -1, dtype=np.int64)
+
+    for cur_row in range(n_rows):
+        shortest = np.full(n_cols, np.inf)
+        path = np.full(n_cols, -1, dtype=np.int64)
+        visited_rows = np.zeros(n_rows, dtype=bool)
+        visited_cols = np.zeros(n_cols, dtype=bool)
+
+        i = cur_row
+        min_val = 0.
+        sink = -1
+        while sink == -1:
+            visited_rows[i] = True
+            remaining = np.flatnonzero(~visited_cols)
+            reduced = min_val + costs[i, remaining] - u[i] - v[remaining]
+            shorter = reduced < shortest[remaining]
+            path[remaining[shorter]] = i
+            shortest[remaining[shorter]] = reduced[shorter]
+
+            # prefer unassigned columns among the closest ones to finish the path early
+            lowest = shortest[remaining].min()
+            closest = remaining[shortest[remaining] == lowest]
+            free = closest[row4col[closest] == -1]
+            j = free[0] if free.size > 0 else closest[0]
+
+            min_val = lowest
+            visited_cols[j] = True
+            if row4col[j] == -1:
+                sink = j
+            else:
+                i = row4col[j]
+
+        u[cur_row] += min_val
+        others = visited_rows.copy()
+        others[cur_row] = False
+        u[others] += min_val - shortest[col4row[others]]
+        v[visited_cols] -= min_val - shortest[visited_cols]
+
+        j = sink
+        while True:
+            i = path[j]
+            row4col[j] = i
+            col4row[i], j = j, col4row[i]
+            if i == cur_row:
+                break
+
+    rids = np.arange(n_rows, dtype=np.int64)
+    if transposed:
+        order = np.argsort(col4row)
+        return col4row[order], rids[order]
+    return rids, col4row
+
+def lsa_solve_auto(costs):
+    """Solves the LSA problem using the fastest available solver for the size of `costs`.
+
+    The solvers are timed by `calibrate_solvers` on first use unless it has been called before.
+    """
+
+    if solver_table is None:
+        calibrate_solvers()
+
+    size = max(costs.shape)
+    for max_size, name in solver_table:
+        if size <= max_size:
+            break
+    return solver_map[name](costs)
+
+def calibrate_solvers(sizes=(5, 20, 80), solvers=None, repeats=3, budget=0.05):
+    """Time the available solvers on random matrices to choose the fastest one per size.
+
+    The result is stored in `solver_table` as a list of (size, solver name) pairs that
+    `lsa_solve_auto` uses for matrices up to that size; larger matrices use the last entry.
+
+    Kwargs
+    ------
+    sizes : sequence of int, optional
+        Sizes of the square cost matrices to time the solvers on
+    solvers : sequence of str, optional
+        Names of the solvers to consider. Defaults to all available solvers
+    repeats : int, optional
+        Number of times each solver is run per size; the best time is used
+    budget : float, optional
+        Solvers that take longer than this many seconds at one size are skipped for larger sizes
+
+    Returns
+    -------
+    table : list
+        Calibrated (size, solver name) pairs
+    """
+
+    import time
+
+    global solver_table
+
+    candidates = list(solvers or available_solvers)
+    rand = np.random.RandomState(0)
+    table = []
+    for size in sorted(sizes):
+        # distance matrices are usually thresholded so half of the pairs are unassignable
+        costs = rand.rand(size, size)
+        costs[rand.rand(size, size) < 0.5] = np.nan
+
+        timings = []
+        for name in candidates:
+            try:
+                best = np.inf
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    solver_map[name](costs)
+                    best = min(best, time.perf_counter() - start)
+            except Exception:
+                continue
+            timings.append((best, name))
+
+        assert timings, 'No LAP solver could be calibrated.'
+        table.append((size, min(timings)[1]))
+        candidates = [name for t, name in timings if t <= budget] or [table[-1][1]]
+
+    solver_table = table
+    return table
+
 def init_standard_solvers():
     import importlib
     from importlib import util
     
-    global available_solvers, default_solver, solver_map
+    global available_solvers, default_solver, solver_map, solver_table
 
     solvers = [
         ('lapsolver', lsa_solve_lapsolver),
         ('lap', lsa_solve_lapjv),        
         ('scipy', lsa_solve_scipy),
+        ('jv', lsa_solve_jv),
         ('munkres', lsa_solve_munkres),
         ('ortools', lsa_solve_ortools),
     ]
 
     solver_map = dict(solvers)    
+    solver_map['auto'] = lsa_solve_auto
+    solver_table = None
     
-    available_solvers = [s[0] for s in solvers if importlib.util.find_spec(s[0]) is not None]
-    if len(available_solvers) == 0:
-        import warnings
-        default_solver = None        
-        warnings.warn('No standard LAP solvers found. Consider `pip install lapsolver` or `pip install scipy`', category=RuntimeWarning)
-    else:
-        default_solver = available_solvers[0]
+    # the built-in solver is preferred over the pure Python and integer cost ones
+    available_solvers = [s[0] for s in solvers if s[0] == 'jv' or importlib.util.find_spec(s[0]) is not None]
+    default_solver = available_solvers[0]
 
 init_standard_solvers()
 
@@ -7,12 +7,98 @@ https://github.com/cheind/py-motmetrics
 from __future__ import division
 from collections import OrderedDict, Iterable
 from evaluation.motmetrics.mot import MOTAccumulator
-from evaluation.motmetrics.lap import linear_sum_assignment
-from lapsolver import solve_dense
+from evaluation.motmetrics.lap import linear_sum_assignment, bipartite_components
+from utilities import profile
 import pandas as pd
 import numpy as np
 import inspect
 import itertools
+import multiprocessing
+
+
+class DfMap:
+    """Views and aggregates of an events dataframe shared by all metrics of one computation.
+
+    Apart from `full`, everything is derived on first access and cached so that metrics
+    read precomputed aggregates instead of rescanning the events. `raw` and `noraw` are
+    only materialized when a metric asks for them; the built-in metrics use the boolean
+    masks and grouped counts instead.
+    """
+
+    def __init__(self, full):
+        self.full = full
+        self._cache = {}
+
+    def _get(self, name, fnc):
+        try:
+            return self._cache[name]
+        except KeyError:
+            v = self._cache[name] = fnc()
+            return v
+
+    @property
+    def raw_mask(self):
+        """Boolean mask of RAW events in `full`."""
+        return self._get('raw_mask', lambda: np.asarray(self.full['Type'] == 'RAW', dtype=bool))
+
+    @property
+    def noraw_mask(self):
+        """Boolean mask of non-RAW events in `full`."""
+        return self._get('noraw_mask', lambda: ~self.raw_mask)
+
+    @property
+    def raw(self):
+        return self._get('raw', lambda: self.full[self.raw_mask])
+
+    @property
+    def noraw(self):
+        return self._get('noraw', lambda: self.full[self.noraw_mask])
+
+    @property
+    def type_counts(self):
+        """Number of events of each type."""
+        return self._get('type_counts', lambda: self.full['Type'].value_counts().reindex(
+            MOTAccumulator.event_types, fill_value=0))
+
+    @property
+    def noraw_miss(self):
+        """Boolean mask of MISS events among non-RAW events."""
+        return self._get('noraw_miss', lambda: np.asarray(
+            self.full['Type'].values[self.noraw_mask] == 'MISS', dtype=bool))
+
+    @property
+    def oid_codes(self):
+        """Integer codes of object ids of non-RAW events, -1 where absent."""
+        self._group_oids()
+        return self._cache['oid_codes']
+
+    @property
+    def oid_stats(self):
+        """Number of non-RAW events (`count`) and of those not missed (`tracked`) per object id."""
+        self._group_oids()
+        return self._cache['oid_stats']
+
+    @property
+    def hid_counts(self):
+        """Number of non-RAW events per hypothesis id."""
+        return self._get('hid_counts', lambda: self._count(self.full['HId'].values[self.noraw_mask])[1])
+
+    @staticmethod
+    def _count(ids, weights=None):
+        codes, labels = pd.factorize(ids)
+        valid = codes >= 0
+        counts = np.bincount(codes[valid], minlength=len(labels))
+        if weights is None:
+            return codes, pd.Series(counts, index=labels)
+        weighted = np.bincount(codes[valid], weights=weights[valid], minlength=len(labels)).astype(counts.dtype)
+        return codes, pd.DataFrame(OrderedDict([('count', counts), ('tracked', weighted)]), index=labels)
+
+    def _group_oids(self):
+        if 'oid_stats' in self._cache:
+            return
+        codes, stats = self._count(self.full['OId'].values[self.noraw_mask], ~self.noraw_miss)
+        self._cache['oid_codes'] = codes
+        self._cache['oid_stats'] = stats
 
 
 class MetricsHost:
@@ -20,6 +106,7 @@ class MetricsHost:
 
     def __init__(self):
         self.metrics = OrderedDict()
+        self._plans = {}
 
     def register(self, fnc, deps='auto', name=None, helpstr=None, formatter=None):
         """Register a new metric.
@@ -72,6 +159,7 @@ class MetricsHost:
             'help': helpstr,
             'formatter': formatter
         }
+        self._plans = {}
 
     @property
     def names(self):
@@ -102,7 +190,7 @@ class MetricsHost:
         df_formatted = pd.concat([df_fmt, df])
         return df_formatted.to_csv(sep="|", index=False)
 
-    def compute(self, df, metrics=None, return_dataframe=True, return_cached=False, name=None, enable_profiling=0):
+    def compute(self, df, metrics=None, return_dataframe=True, return_cached=False, name=None, enable_profiling=None):
         """Compute metrics on the dataframe / accumulator.
         
         Params
@@ -123,6 +211,9 @@ class MetricsHost:
         name : string, optional
             When returning a pandas.DataFrame this is the index of the row containing
             the computed metric values.
+        enable_profiling : bool or None, optional
+            Time the computation of each metric in `utilities.profiler`. If None is
+            passed, the registry-wide setting is used.
         """
 
         if isinstance(df, MOTAccumulator):
@@ -133,23 +224,13 @@ class MetricsHost:
         elif isinstance(metrics, str):
             metrics = [metrics]
 
-        class DfMap:
-            pass
-
-        df_map = DfMap()
-        df_map.full = df
-        df_map.raw = df[df.Type == 'RAW']
-        df_map.noraw = df[df.Type != 'RAW']
-
-        _times = {}
-        _rel_times = {}
+        df_map = DfMap(df)
 
         cache = {}
-        n_metrics = len(metrics)
-        for i, mname in enumerate(metrics):
-            # print('metric {}/{}: {}'.format(i + 1, n_metrics, mname))
-            cache[mname] = self._compute(df_map, mname, cache, parent='summarize',
-                                         _times=_times, _rel_times=_rel_times, enable_profiling=enable_profiling)
+        for mname in self._plan(metrics):
+            minfo = self.metrics[mname]
+            with profile(mname, enable_profiling):
+                cache[mname] = minfo['fnc'](df_map, *[cache[depname] for depname in minfo['deps']])
 
         if name is None:
             name = 0
@@ -161,7 +242,7 @@ class MetricsHost:
 
         return pd.DataFrame(data, index=[name]) if return_dataframe else data
 
-    def compute_many(self, dfs, metrics=None, names=None, generate_overall=False):
+    def compute_many(self, dfs, metrics=None, names=None, generate_overall=False, jobs=1):
         """Compute metrics on multiple dataframe / accumulators.
         
         Params
@@ -182,6 +263,11 @@ class MetricsHost:
             using the same metrics over an accumulator that is the concatentation of
             all input containers. In creating this temporary accumulator, care is taken
             to offset frame indices avoid object id collisions.
+        jobs : int, optional
+            Number of worker processes. If larger than 1, events are packed into
+            flat arrays and the rows, including the summary row, are computed in
+            parallel. 0 or negative values use all available cores. All registered
+            metric functions must be picklable in this case.
 
         Returns
         -------
@@ -193,32 +279,72 @@ class MetricsHost:
 
         if names is None:
             names = range(len(dfs))
+        dfs, names = list(dfs), list(names)
+
+        if jobs is not None and jobs <= 0:
+            jobs = multiprocessing.cpu_count()
+
+        if jobs is None or jobs == 1:
+            if generate_overall:
+                dfs.append(MOTAccumulator.merge_event_dataframes(dfs))
+                names.append('OVERALL')
 
+            partials = [self.compute(acc, metrics=metrics, name=name) for acc, name in zip(dfs, names)]
+            return pd.concat(partials)
+
+        packs = [MOTAccumulator.pack_events(df) for df in dfs]
         if generate_overall:
-            dfs += [MOTAccumulator.merge_event_dataframes(dfs)]
-            names += ['OVERALL']
+            packs.append(MOTAccumulator.merge_packed_events(packs))
+            names.append('OVERALL')
+
+        # the summary row is the most expensive one so it is started first
+        order = list(range(len(packs)))[::-1] if generate_overall else list(range(len(packs)))
+
+        pool = multiprocessing.Pool(min(jobs, len(packs)))
+        try:
+            results = dict((i, pool.apply_async(_compute_packed, (self, packs[i], metrics, names[i])))
+                           for i in order)
+            partials = [results[i].get() for i in range(len(packs))]
+        finally:
+            pool.close()
+            pool.join()
 
-        partials = [self.compute(acc, metrics=metrics, name=name) for acc, name in zip(dfs, names)]
         return pd.concat(partials)
 
-    def _compute(self, df_map, name, cache, parent=None, _times=None, _rel_times=None, enable_profiling=0):
-        """Compute metric and resolve dependencies."""
-        assert name in self.metrics, 'Cannot find metric {} required by {}.'.format(name, parent)
+    def _plan(self, metrics):
+        """Return the requested metrics and their dependencies in evaluation order.
+
+        The order is resolved once per metric set and cached until the next call to `register`.
+        """
+        key = tuple(metrics)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+
+        plan = []
+        state = {}
+
+        def visit(name, parent):
+            assert name in self.metrics, 'Cannot find metric {} required by {}.'.format(name, parent)
+            if state.get(name) == 'done':
+                return
+            assert state.get(name) != 'visiting', 'Cyclic dependency on metric {} required by {}.'.format(name, parent)
+            state[name] = 'visiting'
+            for depname in self.metrics[name]['deps']:
+                visit(depname, name)
+            state[name] = 'done'
+            plan.append(name)
+
+        for mname in metrics:
+            visit(mname, 'summarize')
 
-        minfo = self.metrics[name]
-        vals = []
-        for depname in minfo['deps']:
-            v = cache.get(depname, None)
-            if v is None:
-                # print(f'computing dep: {depname} for {name}')
-                v = cache[depname] = self._compute(df_map, depname, cache, parent=name,
-                                                   enable_profiling=enable_profiling)
-            vals.append(v)
-        # print(f'finally computing metric {name}')
+        self._plans[key] = plan
+        return plan
 
-        # with profile(name, _times, _rel_times, enable_profiling):
-        res = minfo['fnc'](df_map, *vals)
-        return res
+
+def _compute_packed(host, packed, metrics, name):
+    """Worker of `MetricsHost.compute_many` for events packed by `MOTAccumulator.pack_events`."""
+    return host.compute(MOTAccumulator.unpack_events(packed), metrics=metrics, name=name)
 
 
 def num_frames(df):
@@ -228,12 +354,12 @@ def num_frames(df):
 
 def obj_frequencies(df):
     """Total number of occurrences of individual objects over all frames."""
-    return df.noraw.OId.value_counts()
+    return df.oid_stats['count']
 
 
 def pred_frequencies(df):
     """Total number of occurrences of individual predictions over all frames."""
-    return df.noraw.HId.value_counts()
+    return df.hid_counts
 
 
 def num_unique_objects(df, obj_frequencies):
@@ -243,22 +369,22 @@ def num_unique_objects(df, obj_frequencies):
 
 def num_matches(df):
     """Total number matches."""
-    return df.noraw.Type.isin(['MATCH']).sum()
+    return df.type_counts['MATCH']
 
 
 def num_switches(df):
     """Total number of track switches."""
-    return df.noraw.Type.isin(['SWITCH']).sum()
+    return df.type_counts['SWITCH']
 
 
 def num_false_positives(df):
     """Total number of false positives (false-alarms)."""
-    return df.noraw.Type.isin(['FP']).sum()
+    return df.type_counts['FP']
 
 
 def num_misses(df):
     """Total number of misses."""
-    return df.noraw.Type.isin(['MISS']).sum()
+    return df.type_counts['MISS']
 
 
 def num_detections(df, num_matches, num_switches):
@@ -276,15 +402,9 @@ def num_predictions(df, pred_frequencies):
     return pred_frequencies.sum()
 
 
-def num_predictions(df):
-    """Total number of unique prediction appearances over all frames."""
-    return df.noraw.HId.count()
-
-
 def track_ratios(df, obj_frequencies):
     """Ratio of assigned to total appearance count per unique object id."""
-    tracked = df.noraw[df.noraw.Type != 'MISS']['OId'].value_counts()
-    return tracked.div(obj_frequencies).fillna(0.)
+    return df.oid_stats['tracked'].div(obj_frequencies).fillna(0.)
 
 
 def mostly_tracked(df, track_ratios):
@@ -304,19 +424,23 @@ def mostly_lost(df, track_ratios):
 
 def num_fragmentations(df, obj_frequencies):
     """Total number of switches from tracked to not tracked."""
-    fra = 0
-    for o in obj_frequencies.index:
-        # Find first and last time object was not missed (track span). Then count
-        # the number switches from NOT MISS to MISS state.
-        dfo = df.noraw[df.noraw.OId == o]
-        notmiss = dfo[dfo.Type != 'MISS']
-        if len(notmiss) == 0:
-            continue
-        first = notmiss.index[0]
-        last = notmiss.index[-1]
-        diffs = dfo.loc[first:last].Type.apply(lambda x: 1 if x == 'MISS' else 0).diff()
-        fra += diffs[diffs == 1].count()
-    return fra
+    # Within the track span of each object, i.e. between the first and last time it was
+    # not missed, count the number of switches from NOT MISS to MISS state.
+    codes = df.oid_codes
+    valid = codes >= 0
+    order = np.argsort(codes[valid], kind='mergesort')
+    codes = codes[valid][order]
+    miss = df.noraw_miss[valid][order]
+    if codes.size == 0:
+        return 0
+
+    pos = np.arange(codes.size)
+    last_notmiss = np.full(len(obj_frequencies), -1)
+    np.maximum.at(last_notmiss, codes[~miss], pos[~miss])
+
+    switches = miss[1:] & ~miss[:-1] & (codes[1:] == codes[:-1])
+    switches &= pos[1:] < last_notmiss[codes[1:]]
+    return np.count_nonzero(switches)
 
 
 def motp(df, num_detections):
@@ -324,7 +448,7 @@ def motp(df, num_detections):
     if num_detections==0:
         return 0
 
-    return df.noraw['D'].sum() / num_detections
+    return np.nansum(df.full['D'].values[df.noraw_mask]) / num_detections
 
 
 def mota(df, num_misses, num_switches, num_false_positives, num_objects):
@@ -345,97 +469,87 @@ def recall(df, num_detections, num_objects):
     return num_detections / num_objects
 
 
-from utilities import profile
+def _count_frames(frames, codes, n):
+    """Number of distinct frames in which each of `n` coded ids occurs."""
+    valid = codes >= 0
+    keys = np.unique(frames[valid].astype(np.int64) * n + codes[valid])
+    return np.bincount(keys % n, minlength=n) if n > 0 else np.zeros(0, dtype=np.int64)
 
 
 def id_global_assignment(df):
-    """ID measures: Global min-cost assignment for ID measures."""
-    enable_profiling = 0
-    _times = {}
-    _rel_times = None
-    with profile('oids', _times, _rel_times, enable_profiling):
-        oids = df.full['OId'].dropna().unique()
-    with profile('hids', _times, _rel_times, enable_profiling):
-        hids = df.full['HId'].dropna().unique()
-    with profile('hids_idx', _times, _rel_times, enable_profiling):
-        hids_idx = dict((h, i) for i, h in enumerate(hids))
-
-    with profile('hcs', _times, _rel_times, enable_profiling):
-        hcs = [len(df.raw[(df.raw.HId == h)].groupby(level=0)) for h in hids]
-
-    with profile('ocs', _times, _rel_times, enable_profiling):
-        ocs = [len(df.raw[(df.raw.OId == o)].groupby(level=0)) for o in oids]
-
-    with profile('misc1', _times, _rel_times, enable_profiling):
-        no = oids.shape[0]
-        nh = hids.shape[0]
-
-        df = df.raw.reset_index()
-        df = df.set_index(['OId', 'HId'])
-
-    with profile('sort_index', _times, _rel_times, enable_profiling):
-        df = df.sort_index(level=[0, 1])
-
-    with profile('misc2', _times, _rel_times, enable_profiling):
-        fpmatrix = np.full((no + nh, no + nh), 0.)
-        fnmatrix = np.full((no + nh, no + nh), 0.)
-        fpmatrix[no:, :nh] = np.nan
-        fnmatrix[:no, nh:] = np.nan
-
-    with profile('fnmatrix', _times, _rel_times, enable_profiling):
-        for r, oc in enumerate(ocs):
-            fnmatrix[r, :nh] = oc
-            fnmatrix[r, nh + r] = oc
-
-    with profile('fnmatrix', _times, _rel_times, enable_profiling):
-        for c, hc in enumerate(hcs):
-            fpmatrix[:no, c] = hc
-            fpmatrix[c + no, c] = hc
-
-    with profile('nested_loop', _times, _rel_times, enable_profiling):
-        for r, o in enumerate(oids):
-            try:
-                _df_o = df.loc[o, 'D']
-                df_o = _df_o.dropna()
-            except:
-                df_o = pd.Series([])
-            for h, ex in df_o.groupby(level=0).count().iteritems():
-                c = hids_idx[h]
-
-                fpmatrix[r, c] -= ex
-                fnmatrix[r, c] -= ex
-
-    with profile('costs', _times, _rel_times, enable_profiling):
-        costs = fpmatrix + fnmatrix
-
-    with profile(f'linear_sum_assignment {costs.shape}', _times, _rel_times, enable_profiling):
-        rids, cids = solve_dense(costs)
-
-    _rel_times = {}
-
-    with profile('min_cost', _times, _rel_times, enable_profiling):
-        min_cost = costs[rids, cids].sum()
+    """ID measures: Global min-cost assignment for ID measures.
+
+    Assigning an object to a hypothesis costs the frames in which only one of them is
+    present while an unassigned id costs all of its frames. The minimum cost is therefore
+    reached by the matching that maximizes the number of frames in which the assigned pairs
+    are matchable. Only pairs that are matchable at least once take part in it, so the
+    matching is solved on the sparse graph of such pairs one connected component at a time.
+    """
+    full = df.full
+    raw_mask = df.raw_mask
+
+    with profile('counts'):
+        frames, _ = pd.factorize(full.index.get_level_values(0).values[raw_mask])
+        oid_codes, oids = pd.factorize(full['OId'].values[raw_mask])
+        hid_codes, hids = pd.factorize(full['HId'].values[raw_mask])
+        no = len(oids)
+        nh = len(hids)
+
+        ocs = _count_frames(frames, oid_codes, no)
+        hcs = _count_frames(frames, hid_codes, nh)
+
+        valid = (oid_codes >= 0) & (hid_codes >= 0) & ~np.isnan(full['D'].values[raw_mask])
+        pairs, ex = np.unique(oid_codes[valid].astype(np.int64) * nh + hid_codes[valid], return_counts=True)
+        rows, cols = np.divmod(pairs, max(nh, 1))
+
+    with profile('components'):
+        row_labels, _ = bipartite_components(rows, cols, no, nh)
+        order = np.argsort(row_labels[rows], kind='mergesort')
+        _, starts = np.unique(row_labels[rows][order], return_index=True)
+        groups = np.split(order, starts[1:]) if order.size > 0 else []
+
+    with profile('linear_sum_assignment'):
+        matched = []
+        for edges in groups:
+            _rows, _r = np.unique(rows[edges], return_inverse=True)
+            _cols, _c = np.unique(cols[edges], return_inverse=True)
+            if _rows.size == 1 or _cols.size == 1:
+                matched.append(edges[[np.argmax(ex[edges])]])
+                continue
+            # pairs that are never matchable are equivalent to leaving both ids unassigned
+            costs = np.zeros((_rows.size, _cols.size))
+            costs[_r, _c] = -ex[edges]
+            edge_idx = np.full(costs.shape, -1, dtype=np.int64)
+            edge_idx[_r, _c] = edges
+            rids, cids = linear_sum_assignment(costs)
+            edges = edge_idx[rids, cids]
+            matched.append(edges[edges >= 0])
+        matched = np.concatenate(matched) if matched else np.zeros(0, dtype=np.int64)
+
+    with profile('min_cost'):
+        num_matched = ex[matched].sum()
+        idfp = np.float64(hcs.sum() - num_matched)
+        idfn = np.float64(ocs.sum() - num_matched)
 
     return {
-        'fpmatrix': fpmatrix,
-        'fnmatrix': fnmatrix,
-        'rids': rids,
-        'cids': cids,
-        'costs': costs,
-        'min_cost': min_cost
+        'oids': oids,
+        'hids': hids,
+        'rids': rows[matched],
+        'cids': cols[matched],
+        'idfp': idfp,
+        'idfn': idfn,
+        'min_cost': idfp + idfn
     }
 
 
 def idfp(df, id_global_assignment):
     """ID measures: Number of false positive matches after global min-cost matching."""
-    rids, cids = id_global_assignment['rids'], id_global_assignment['cids']
-    return id_global_assignment['fpmatrix'][rids, cids].sum()
+    return id_global_assignment['idfp']
 
 
 def idfn(df, id_global_assignment):
     """ID measures: Number of false negatives matches after global min-cost matching."""
-    rids, cids = id_global_assignment['rids'], id_global_assignment['cids']
-    return id_global_assignment['fnmatrix'][rids, cids].sum()
+    return id_global_assignment['idfn']
 
 
 def idtp(df, id_global_assignment, num_objects, idfn):
@@ -5,7 +5,6 @@ https://github.com/cheind/py-motmetrics
 """
 
 import numpy as np
-import numpy.ma as ma
 import pandas as pd
 from collections import OrderedDict
 from itertools import count
@@ -56,6 +55,9 @@ class MOTAccumulator(object):
     Computer Vision and Pattern Recognition, 2009. CVPR 2009. IEEE Conference on. IEEE, 2009.
     """
 
+    event_types = ['RAW', 'FP', 'MISS', 'SWITCH', 'MATCH']
+    """Categories of the `Type` column of event dataframes."""
+
     def __init__(self, auto_id=False, max_switch_time=float('inf')):
         """Create a MOTAccumulator.
 
@@ -133,9 +135,11 @@ class MOTAccumulator(object):
         """
         
         self.dirty_events = True
-        oids = ma.array(oids, mask=np.zeros(len(oids)))
-        hids = ma.array(hids, mask=np.zeros(len(hids)))  
-        dists = np.atleast_2d(dists).astype(float).reshape(oids.shape[0], hids.shape[0]).copy()
+        oids = np.asarray(oids)
+        hids = np.asarray(hids)
+        no = len(oids)
+        nh = len(hids)
+        dists = np.atleast_2d(dists).astype(float).reshape(no, nh).copy()
 
         if frameid is None:            
             assert self.auto_id, 'auto-id is not enabled'
@@ -145,51 +149,59 @@ class MOTAccumulator(object):
                 frameid = 0
         else:
             assert not self.auto_id, 'Cannot provide frame id when auto-id is enabled'
-        
-        eid = count()
+
+        # Iterating arrays keeps ids as numpy scalars like indexing does
+        o_list = list(oids)
+        h_list = list(hids)
+        o_free = np.ones(no, dtype=bool)
+        h_free = np.ones(nh, dtype=bool)
+        events = []
 
         # 0. Record raw events
 
-        no = len(oids)
-        nh = len(hids)
-        
         if no * nh > 0:
-            for i in range(no):
-                for j in range(nh):
-                    self._indices.append((frameid, next(eid)))
-                    self._events.append(['RAW', oids[i], hids[j], dists[i,j]])
+            events.extend(['RAW', o, h, d] for o, row in zip(o_list, dists) for h, d in zip(h_list, row))
         elif no == 0:
-            for i in range(nh):
-                self._indices.append((frameid, next(eid)))
-                self._events.append(['RAW', np.nan, hids[i], np.nan])       
+            events.extend(['RAW', np.nan, h, np.nan] for h in h_list)
         elif nh == 0:
-            for i in range(no):
-                self._indices.append((frameid, next(eid)))
-                self._events.append(['RAW', oids[i], np.nan, np.nan])
+            events.extend(['RAW', o, np.nan, np.nan] for o in o_list)
 
-        if oids.size * hids.size > 0:    
+        if no * nh > 0:
             # 1. Try to re-establish tracks from previous correspondences
-            for i in range(oids.shape[0]):
-                if not oids[i] in self.m:
-                    continue
-
-                hprev = self.m[oids[i]]                    
-                j, = np.where(hids==hprev)  
-                if j.shape[0] == 0:
-                    continue
-                j = j[0]
-
-                if np.isfinite(dists[i,j]):
-                    oids[i] = ma.masked
-                    hids[j] = ma.masked
-                    self.m[oids.data[i]] = hids.data[j]
-                    
-                    self._indices.append((frameid, next(eid)))
-                    self._events.append(['MATCH', oids.data[i], hids.data[j], dists[i, j]])
+            hcols = {}
+            for j, h in enumerate(h_list):
+                hcols.setdefault(h, []).append(j)
+
+            if len(hcols) == nh:
+                # Each previous hypothesis is found in at most one column, which goes to the
+                # first object continuing its track with a finite distance
+                cols = np.array([hcols.get(self.m[o], [-1])[0] if o in self.m else -1 for o in o_list], dtype=np.int64)
+                rows = np.flatnonzero(cols >= 0)
+                rows = rows[np.isfinite(dists[rows, cols[rows]])]
+                _, first = np.unique(cols[rows], return_index=True)
+                rows = np.sort(rows[first])
+                continued = zip(rows, cols[rows])
+            else:
+                # With duplicate hypothesis ids each object takes the first column not already
+                # continued and gives up if its distance to that one is not finite
+                continued = []
+                for i, o in enumerate(o_list):
+                    if o not in self.m:
+                        continue
+                    j = next((j for j in hcols.get(self.m[o], []) if h_free[j]), None)
+                    if j is not None and np.isfinite(dists[i, j]):
+                        continued.append((i, j))
+                        h_free[j] = False
+
+            for i, j in continued:
+                o_free[i] = False
+                h_free[j] = False
+                self.m[o_list[i]] = h_list[j]
+                events.append(['MATCH', o_list[i], h_list[j], dists[i, j]])
 
             # 2. Try to remaining objects/hypotheses
-            dists[oids.mask, :] = np.nan
-            dists[:, hids.mask] = np.nan
+            dists[~o_free, :] = np.nan
+            dists[:, ~h_free] = np.nan
         
             rids, cids = linear_sum_assignment(dists)
 
@@ -197,31 +209,28 @@ class MOTAccumulator(object):
                 if not np.isfinite(dists[i,j]):
                     continue
                 
-                o = oids[i]
-                h = hids.data[j]
+                o = o_list[i]
+                h = h_list[j]
                 is_switch = o in self.m and \
                             self.m[o] != h and \
                             abs(frameid - self.last_occurrence[o]) <= self.max_switch_time
                 cat = 'SWITCH' if is_switch else 'MATCH'
-                self._indices.append((frameid, next(eid)))
-                self._events.append([cat, oids.data[i], hids.data[j], dists[i, j]])
-                oids[i] = ma.masked
-                hids[j] = ma.masked
+                events.append([cat, o, h, dists[i, j]])
+                o_free[i] = False
+                h_free[j] = False
                 self.m[o] = h
 
         # 3. All remaining objects are missed
-        for o in oids[~oids.mask]:
-            self._indices.append((frameid, next(eid)))
-            self._events.append(['MISS', o, np.nan, np.nan])
+        events.extend(['MISS', o_list[i], np.nan, np.nan] for i in np.flatnonzero(o_free))
         
         # 4. All remaining hypotheses are false alarms
-        for h in hids[~hids.mask]:
-            self._indices.append((frameid, next(eid)))
-            self._events.append(['FP', np.nan, h, np.nan])
+        events.extend(['FP', np.nan, h_list[j], np.nan] for j in np.flatnonzero(h_free))
+
+        self._indices.extend((frameid, e) for e in range(len(events)))
+        self._events.extend(events)
 
         # 5. Update occurance state
-        for o in oids.data:            
-            self.last_occurrence[o] = frameid
+        self.last_occurrence.update(dict.fromkeys(o_list, frameid))
 
         return frameid
 
@@ -241,7 +250,7 @@ class MOTAccumulator(object):
     def new_event_dataframe():
         """Create a new DataFrame for event tracking."""
         idx = pd.MultiIndex(levels=[[],[]], codes=[[],[]], names=['FrameId','Event'])
-        cats = pd.Categorical([], categories=['RAW', 'FP', 'MISS', 'SWITCH', 'MATCH'])
+        cats = pd.Categorical([], categories=MOTAccumulator.event_types)
         df = pd.DataFrame(
             OrderedDict([
                 ('Type', pd.Series(cats)),          # Type of event. One of FP (false positive), MISS, SWITCH, MATCH
@@ -268,7 +277,7 @@ class MOTAccumulator(object):
 
         tevents = list(zip(*events))
 
-        raw_type = pd.Categorical(tevents[0], categories=['RAW', 'FP', 'MISS', 'SWITCH', 'MATCH'], ordered=False)
+        raw_type = pd.Categorical(tevents[0], categories=MOTAccumulator.event_types, ordered=False)
         series = [
             pd.Series(raw_type, name='Type'),
             pd.Series(tevents[1], dtype=object, name='OId'),
@@ -283,6 +292,94 @@ class MOTAccumulator(object):
     
 
 
+    @staticmethod
+    def pack_events(df):
+        """Convert events to a dict of flat numpy arrays.
+
+        Object and hypothesis ids are stored as integer codes into arrays of unique labels
+        (-1 where absent) and event types as codes into `MOTAccumulator.event_types`. This is
+        much cheaper to transfer between processes than a pickled DataFrame.
+
+        Params
+        ------
+        df : pandas.DataFrame or MOTAccumulator
+            Events to pack
+
+        Returns
+        -------
+        packed : dict
+            Arrays `frames`, `events`, `types`, `oids`, `hids`, `D`, `oid_labels` and `hid_labels`
+        """
+        if isinstance(df, MOTAccumulator):
+            df = df.events
+
+        oids, oid_labels = pd.factorize(df['OId'].values)
+        hids, hid_labels = pd.factorize(df['HId'].values)
+
+        return {
+            'frames': np.asarray(df.index.get_level_values(0)),
+            'events': np.asarray(df.index.get_level_values(1)),
+            'types': pd.Categorical(df['Type'], categories=MOTAccumulator.event_types).codes,
+            'oids': oids,
+            'hids': hids,
+            'D': np.asarray(df['D'].values, dtype=float),
+            'oid_labels': np.asarray(oid_labels, dtype=object),
+            'hid_labels': np.asarray(hid_labels, dtype=object),
+        }
+
+    @staticmethod
+    def unpack_events(packed):
+        """Create an event DataFrame from the output of `pack_events`."""
+
+        def ids_from_codes(codes, labels):
+            ids = np.full(codes.shape[0], np.nan, dtype=object)
+            valid = codes >= 0
+            ids[valid] = labels[codes[valid]]
+            return ids
+
+        idx = pd.MultiIndex.from_arrays([packed['frames'], packed['events']], names=['FrameId', 'Event'])
+        df = pd.DataFrame(
+            OrderedDict([
+                ('Type', pd.Categorical.from_codes(packed['types'], categories=MOTAccumulator.event_types)),
+                ('OId', ids_from_codes(packed['oids'], packed['oid_labels'])),
+                ('HId', ids_from_codes(packed['hids'], packed['hid_labels'])),
+                ('D', packed['D']),
+            ]),
+            index=idx
+        )
+        return df
+
+    @staticmethod
+    def merge_packed_events(packs):
+        """Merge the outputs of `pack_events`.
+
+        Equivalent to `merge_event_dataframes` with default arguments: frame indices are
+        offset to be unique and object / hypothesis ids are replaced by strings of running
+        counters, without building any intermediate DataFrames.
+        """
+        merged = dict((k, []) for k in ('frames', 'events', 'types', 'oids', 'hids', 'D'))
+        next_frame_id = 0
+        n_frames = 0
+        n_oids = n_hids = 0
+        for packed in packs:
+            frames = packed['frames'] + next_frame_id
+            merged['frames'].append(frames)
+            for k in ('events', 'types', 'D'):
+                merged[k].append(packed[k])
+            merged['oids'].append(np.where(packed['oids'] >= 0, packed['oids'] + n_oids, -1))
+            merged['hids'].append(np.where(packed['hids'] >= 0, packed['hids'] + n_hids, -1))
+
+            n_oids += packed['oid_labels'].shape[0]
+            n_hids += packed['hid_labels'].shape[0]
+            if frames.size > 0:
+                n_frames += np.unique(frames).shape[0]
+                next_frame_id = max(frames.max() + 1, n_frames)
+
+        merged = dict((k, np.concatenate(v) if v else np.empty(0)) for k, v in merged.items())
+        merged['oid_labels'] = np.array([str(i) for i in range(n_oids)], dtype=object)
+        merged['hid_labels'] = np.array([str(i) for i in range(n_hids)], dtype=object)
+        return merged
+
     @staticmethod
     def merge_event_dataframes(dfs, update_frame_indices=True, update_oids=True, update_hids=True, return_mappings=False):
         """Merge dataframes.
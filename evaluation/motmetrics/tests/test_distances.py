@@ -35,6 +35,16 @@ def test_norm2squared():
         ]
     )    
 
+def test_norm2squared_far_from_origin():
+    a = np.array([[1e4 + 0.1, 1e4 + 0.2], [1e4, 1e4]])
+    b = np.array([[1e4 + 0.4, 1e4 + 0.6], [1e4, 1e4]])
+
+    # the expanded form loses precision far from the origin but never goes negative and
+    # pairs at the threshold are decided exactly
+    C = mm.distances.norm2squared_matrix(a, b, max_d2=0.25)
+    np.testing.assert_allclose(C, [[0.25, 0.05], [np.nan, 0]], atol=1e-6)
+    assert (C[np.isfinite(C)] >= 0).all()
+
 def test_norm2squared_empty():
     a = []
     b = np.array([[0., 0],[1., 1]])
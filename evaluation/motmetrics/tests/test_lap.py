@@ -37,3 +37,72 @@ def test_change_solver():
     rids, cids = lap.linear_sum_assignment(costs)
     assert mysolver.called == 1
 
+
+def test_decompose():
+    
+    def mysolver(x):
+        mysolver.shapes.append(x.shape)
+        return lap.lsa_solve_scipy(x)
+    mysolver.shapes = []
+
+    # components {0}x{0,1}, {1,2}x{2}, {3}x{3,4} and {4}x{5}; column 6 is unassignable
+    costs = np.full((5, 7), np.nan)
+    costs[0, :2] = [2, 1]
+    costs[1:3, 2] = [1.5, 3]
+    costs[3, 3:5] = [5, 4.]
+    costs[4, 5] = 1.
+
+    rids, cids = lap.linear_sum_assignment(costs, solver=mysolver)
+    np.testing.assert_equal(rids, [0, 1, 3, 4])
+    np.testing.assert_equal(cids, [1, 2, 4, 5])
+    assert mysolver.shapes == []
+
+    # munkres does not terminate when some rows cannot be assigned
+    for s in [s for s in lap.available_solvers if s != 'munkres']:
+        r = lap.linear_sum_assignment(costs, solver=s, decompose=False)
+        m = np.isfinite(costs[r])
+        np.testing.assert_equal(np.asarray(r)[:, m], [rids, cids])
+
+    # tied costs are passed to the solver undecomposed
+    costs[2, 2] = 1.5
+    lap.linear_sum_assignment(costs, solver=mysolver)
+    assert mysolver.shapes == [(5, 7)]
+
+    # so are components with several rows and columns
+    mysolver.shapes = []
+    costs[2, 2] = 3.
+    costs[1, 1] = 7.
+    lap.linear_sum_assignment(costs, solver=mysolver)
+    assert mysolver.shapes == [(5, 7)]
+
+    # distinct costs but two assignments with the same total in the block of rows 1 and 2
+    costs = np.array([[np.nan, .4, np.nan, np.nan], [np.nan, np.nan, .4, .3], [np.nan, np.nan, .2, .1]])
+    for s in lap.available_solvers:
+        r = lap.linear_sum_assignment(costs, solver=s)
+        expected = lap.linear_sum_assignment(costs, solver=s, decompose=False)
+        np.testing.assert_equal(r, expected)
+
+    row_labels, col_labels = lap.bipartite_components([0, 1, 1, 2], [1, 1, 2, 0], 4, 3)
+    np.testing.assert_equal(row_labels, [0, 0, 2, 3])
+    np.testing.assert_equal(col_labels, [2, 0, 0])
+
+def test_jv_solver():
+    assert 'jv' in lap.available_solvers
+
+    rand = np.random.RandomState(0)
+    for shape in [(0, 3), (1, 1), (4, 7), (7, 4), (10, 10)]:
+        costs = rand.rand(*shape)
+        costs[rand.rand(*shape) < 0.3] = np.nan
+        expected = lap.lsa_solve_scipy(costs)
+        m = np.isfinite(costs[expected])
+        rids, cids = lap.lsa_solve_jv(costs)
+        np.testing.assert_equal(np.asarray([rids, cids])[:, np.isfinite(costs[rids, cids])], np.asarray(expected)[:, m])
+
+def test_auto_solver():
+    table = lap.calibrate_solvers(sizes=(2, 10), repeats=1)
+    assert [size for size, _ in table] == [2, 10]
+    assert all(name in lap.available_solvers for _, name in table)
+
+    costs = np.array([[6, 9, 1],[10, 3, 2],[8, 7, 4.]])
+    rids, cids = lap.linear_sum_assignment(costs, solver='auto')
+    np.testing.assert_allclose([rids, cids], [[0, 1, 2], [2, 1, 0]])
@@ -141,4 +141,46 @@ def test_motchallenge_files():
         [0.624296, 0.799176, 0.512211, 0.602640, 0.940268, 18.0, 6, 10, 2, 58, 602, 14, 13, 0.555116, 0.330177],
     ])
 
-    np.testing.assert_allclose(summary, expected, atol=1e-3)
\ No newline at end of file
+    np.testing.assert_allclose(summary, expected, atol=1e-3)
+
+    summary_parallel = mh.compute_many(accs, metrics=mm.metrics.motchallenge_metrics, names=dnames,
+                                       generate_overall=True, jobs=2)
+    np.testing.assert_allclose(summary_parallel, summary)
+
+def test_id_global_assignment():
+    acc = mm.MOTAccumulator()
+    acc.update([1, 2, 3], ['a', 'b'], [[0.1, 0.5], [np.nan, 0.2], [np.nan, np.nan]], frameid=0)
+    acc.update([1, 2, 3], ['a', 'b'], [[0.1, 0.5], [np.nan, 0.2], [np.nan, np.nan]], frameid=1)
+    acc.update([1], ['a'], [[0.1]], frameid=2)
+    acc.update([1], ['b'], [[0.1]], frameid=3)
+    acc.update([], ['c'], [], frameid=4)
+
+    mh = mm.metrics.create()
+    metr = mh.compute(acc, metrics=['idfp', 'idfn', 'idtp'], return_dataframe=False, return_cached=True)
+
+    # 1-a and 2-b share 3 + 2 frames which beats the 3 frames of 1-b
+    ga = metr['id_global_assignment']
+    assert sorted(zip(ga['oids'][ga['rids']], ga['hids'][ga['cids']])) == [(1, 'a'), (2, 'b')]
+    assert metr['idfn'] == 8 - 5
+    assert metr['idfp'] == 7 - 5
+    assert metr['idtp'] == 5
+
+def test_compute_profiling():
+    from utilities import profiler
+
+    acc = mm.MOTAccumulator(auto_id=True)
+    acc.update([1, 2], ['a', 'b'], [[1, 0.5], [0.3, 1]])
+    acc.update([1, 2], ['a'], [[0.2], [0.4]])
+
+    profiler.reset()
+    mh = mm.metrics.create()
+    mh.compute(acc, metrics=['mota', 'idf1'], enable_profiling=True)
+    paths = [r['path'] for r in profiler.report()]
+    profiler.reset()
+
+    assert 'mota' in paths
+    assert 'num_misses' in paths
+    assert 'id_global_assignment/linear_sum_assignment' in paths
+
+    mh.compute(acc, metrics=['mota'])
+    assert profiler.report() == []
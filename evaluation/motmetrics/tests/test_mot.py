@@ -73,6 +73,22 @@ def test_max_switch_time():
     df = acc.events.loc[frameid]
     assert ((df.Type == 'MATCH') | (df.Type == 'RAW')).all()
 
+def test_continue_tracks():
+    acc = mm.MOTAccumulator()
+    acc.update([1, 2], ['a', 'b'], [[0.1, 0.5], [0.5, 0.1]], frameid=0) # 1->a, 2->b
+    acc.update([2], ['a'], [[0.1]], frameid=1) # 2->a
+    # with duplicate hypothesis ids, the second object continues with the next column
+    acc.update([1, 2], ['a', 'a'], [[0.1, 0.2], [0.1, 0.2]], frameid=2)
+
+    df = acc.mot_events.loc[2]
+    assert df.values.tolist() == [['MATCH', 1, 'a', 0.1], ['MATCH', 2, 'a', 0.2]]
+
+    # 1 and 2 both continue with a, first object wins
+    acc.update([1, 2], ['b', 'a'], [[0.1, 0.2], [0.1, 0.2]], frameid=3)
+
+    df = acc.mot_events.loc[3]
+    assert df.values.tolist() == [['MATCH', 1, 'a', 0.2], ['SWITCH', 2, 'b', 0.1]]
+
 def test_auto_id():
     acc = mm.MOTAccumulator(auto_id=True)
     acc.update([1, 2, 3, 4], [], [])
@@ -172,3 +188,19 @@ def test_merge_dataframes():
     from pandas.util.testing import assert_frame_equal
     assert_frame_equal(r, expect)
     
+
+
+def test_pack_events():
+    acc = mm.MOTAccumulator()
+
+    acc.update([], ['a', 'b'], [], frameid=0)
+    acc.update([1, 2], [], [], frameid=1)
+    acc.update([1, 2], ['a', 'b'], [[1, 0.5], [0.3, 1]], frameid=2)
+    acc.update([1, 2], ['a', 'b'], [[0.2, np.nan], [np.nan, 0.1]], frameid=3)
+
+    from pandas.util.testing import assert_frame_equal
+    assert_frame_equal(mm.MOTAccumulator.unpack_events(mm.MOTAccumulator.pack_events(acc)), acc.events)
+
+    packed = [mm.MOTAccumulator.pack_events(acc.events)] * 2
+    merged = mm.MOTAccumulator.unpack_events(mm.MOTAccumulator.merge_packed_events(packed))
+    assert_frame_equal(merged, mm.MOTAccumulator.merge_event_dataframes([acc.events, acc.events]))
@@ -18,15 +18,19 @@ class Input:
             self.annotations = Annotations.Params()
             self.tracking_res = TrackingResults.Params()
 
-    def __init__(self, params, logger):
+    def __init__(self, params, logger, annotations_cache=None):
         """
         :type params: Input.Params
         :type logger: CustomLogger
+        :param dict | None annotations_cache: annotations that have already been read and indexed, keyed by
+        _annotations_key; annotations read by this object are added to it so that they can be reused
+        by other objects sharing the same dict
         :rtype: None
         """
 
         self.params = copy.deepcopy(params)
         self._logger = logger
+        self._annotations_cache = annotations_cache
 
         self.source_path = None
 
@@ -86,6 +90,16 @@ class Input:
             annotations_params.path = linux_path(self.params.db_root_path, self.seq_set,
                                                  annotations_params.src_dir, self.seq_name + '.txt')
 
+        if self._annotations_cache is not None:
+            key = self._annotations_key(annotations_params)
+            try:
+                self.annotations = self._annotations_cache[key]
+            except KeyError:
+                pass
+            else:
+                self._logger.info('Using cached annotations from {:s}'.format(annotations_params.path))
+                return True
+
         self.annotations = Annotations(annotations_params, self._logger)
         self.annotations.initialize(self.seq_n_frames, self.start_frame_id, self.end_frame_id)
 
@@ -94,8 +108,21 @@ class Input:
             self.annotations = None
             return False
 
+        if self._annotations_cache is not None:
+            self._annotations_cache[key] = self.annotations
+
         return True
 
+    def _annotations_key(self, annotations_params):
+        """
+        annotations are only reusable for the same file, subsequence and reading options
+
+        :type annotations_params: Annotations.Params
+        :rtype: tuple
+        """
+        options = tuple(sorted((k, str(v)) for k, v in vars(annotations_params).items() if k != 'help'))
+        return self.seq_n_frames, self.start_frame_id, self.end_frame_id, options
+
     def read_tracking_results(self, res_path):
         """
         :type res_path: str
@@ -110,3 +137,17 @@ class Input:
             self.tracking_res = None
             return False
         return True
+
+    def set_tracking_results(self, data):
+        """
+        use tracking results held in memory instead of reading them from a file
+
+        :param np.ndarray data: N x 10 array with the same contents as a results file
+        :rtype: bool
+        """
+        self.tracking_res = TrackingResults.from_array(data, self.params.tracking_res, self._logger,
+                                                       self.seq_n_frames, self.start_frame_id, self.end_frame_id)
+        if self.tracking_res is None:
+            self._logger.error('Failed to build tracking results')
+            return False
+        return True
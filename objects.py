@@ -3,10 +3,11 @@ import os
 import sys
 import time
 import ast
+import copy
 
 from paramparse import MultiPath
 
-from utilities import compute_overlaps_multi, CrossOverlaps, SelfOverlaps, CustomLogger, MDPStates
+from utilities import compute_overlaps_multi, CrossOverlaps, SelfOverlaps, CustomLogger, MDPStates, profile
 
 
 class Objects:
@@ -151,7 +152,8 @@ class Objects:
 
         self.path = self._params.path
         self._logger.info('Reading from {:s}'.format(self._params.path))
-        self.data = np.loadtxt(self._params.path, delimiter=',', ndmin=2)
+        with profile('read'):
+            self.data = np.loadtxt(self._params.path, delimiter=',', ndmin=2)
 
         return True
 
@@ -407,13 +409,14 @@ class Annotations(Objects):
         self._logger.info('count: {:d}'.format(self.count))
 
         # print('Building frame index...'.format(self.type))
-        if self._params.sort_by_frame_ids:
-            self._build_index()
-        else:
-            self._build_index_slow()
+        with profile('index'):
+            if self._params.sort_by_frame_ids:
+                self._build_index()
+            else:
+                self._build_index_slow()
 
-        """obtain the indices contained in each of the trajectories"""
-        self._build_trajectory_index()
+            """obtain the indices contained in each of the trajectories"""
+            self._build_trajectory_index()
 
         return True
 
@@ -497,13 +500,99 @@ class Annotations(Objects):
         # return None, 'MOT evaluator is not available'
         assert self.n_frames == track_res.n_frames, 'MOT data to be compared must have the same number of frames'
 
+        if dist_type == -1:
+            return summary, strsummary, mm.MOTAccumulator(auto_id=True)
+
+        acc = self.get_mot_accumulator(track_res, dist_type)
+
+        self._logger.info('Computing MOT metrics...')
+        start_t = time.time()
+        mh = mm.metrics.create()
+        with profile('compute'):
+            summary = mh.compute(acc, metrics=mm.metrics.motchallenge_metrics, name=seq_name)
+        end_t = time.time()
+        fps = self.n_frames / (end_t - start_t)
+        self._logger.info('FPS: {:.3f}'.format(fps))
+
+        summary = summary.rename(columns=mm.io.motchallenge_metric_names)
+        strsummary = mm.io.render_summary(
+            summary,
+            formatters=mh.formatters
+        )
+        return summary, strsummary, acc
+
+    def get_mot_metrics_multi(self, track_res, thresholds, dist_type=0):
+        """
+        evaluate the tracking result at several matching thresholds in a single pass; the annotations and
+        tracking results are only read and indexed once and the distances between them in each frame are only
+        computed once but the association and the metrics are still computed separately for each threshold
+
+        :param TrackingResults track_res: tracking result
+        :param list[float] thresholds: minimum IoU between matching boxes if dist_type is 0 and
+        maximum squared Euclidean distance between them otherwise
+        :type dist_type: int
+        :return: summary with one row per threshold, its string version and the accumulator of each threshold
+        :rtype: pandas.DataFrame, str, list[mm.MOTAccumulator]
+        """
+        import evaluation.motmetrics as mm
+
+        assert self.n_frames == track_res.n_frames, 'MOT data to be compared must have the same number of frames'
+        assert len(thresholds) > 0, 'no thresholds provided'
+
+        self._logger.info('Accumulating MOT data for {:d} thresholds...'.format(len(thresholds)))
+        start_t = time.time()
+
+        if dist_type == 0:
+            dist_func = mm.distances.iou_matrix
+            """same as iou_matrix with max_iou = 1 - threshold"""
+            max_dists = [1. - threshold for threshold in thresholds]
+            self._logger.info('Using intersection over union (IoU) distance')
+        else:
+            dist_func = mm.distances.norm2squared_matrix
+            max_dists = list(thresholds)
+            self._logger.info('Using squared Euclidean distance')
+
+        accs = [mm.MOTAccumulator(auto_id=True) for _ in thresholds]
+
+        print_diff = int(self.n_frames / 10)
+
+        with profile('accumulate'):
+            self._accumulate(accs, max_dists, dist_func, track_res, print_diff)
+
+        end_t = time.time()
+        fps = self.n_frames / (end_t - start_t)
+        self._logger.info('FPS: {:.3f}'.format(fps))
+
+        self._logger.info('Computing MOT metrics...')
+        mh = mm.metrics.create()
+        with profile('compute'):
+            summary = mh.compute_many(accs, metrics=mm.metrics.motchallenge_metrics, names=list(thresholds))
+        summary.index.name = 'threshold'
+
+        summary = summary.rename(columns=mm.io.motchallenge_metric_names)
+        strsummary = mm.io.render_summary(
+            summary,
+            formatters=mh.formatters
+        )
+        return summary, strsummary, accs
+
+    def get_mot_accumulator(self, track_res, dist_type=0):
+        """
+        match the tracking result to the annotations in each frame without computing any metrics
+
+        :param TrackingResults track_res: tracking result
+        :type dist_type: int
+        :rtype: mm.MOTAccumulator
+        """
+        import evaluation.motmetrics as mm
+
+        assert self.n_frames == track_res.n_frames, 'MOT data to be compared must have the same number of frames'
+
         self._logger.info('Accumulating MOT data...')
         start_t = time.time()
         acc = mm.MOTAccumulator(auto_id=True)
 
-        if dist_type == -1:
-            return summary, strsummary, acc
-        elif dist_type == 0:
+        if dist_type == 0:
             dist_func = mm.distances.iou_matrix
             self._logger.info('Using intersection over union (IoU) distance')
         else:
@@ -512,6 +601,27 @@ class Annotations(Objects):
 
         print_diff = int(self.n_frames / 10)
 
+        with profile('accumulate'):
+            self._accumulate((acc,), (None,), dist_func, track_res, print_diff)
+
+        end_t = time.time()
+        fps = self.n_frames / (end_t - start_t)
+        self._logger.info('FPS: {:.3f}'.format(fps))
+
+        return acc
+
+    def _accumulate(self, accs, max_dists, dist_func, track_res, print_diff):
+        """
+        compute the distances in each frame once and update each accumulator with them after discarding the
+        ones larger than its maximum distance
+
+        :type accs: list[mm.MOTAccumulator] | tuple[mm.MOTAccumulator]
+        :param list[float | None] | tuple[float | None] max_dists: maximum distance between matching objects for
+        each accumulator or None to use the distances as they are
+        :type track_res: TrackingResults
+        :type print_diff: int
+        :rtype: None
+        """
         for frame_id in range(self.n_frames):
             idx1 = self.idx[frame_id]
             idx2 = track_res.idx[frame_id]
@@ -530,7 +640,12 @@ class Annotations(Objects):
                 ids_2 = []
 
             dist = dist_func(bbs_1, bbs_2)
-            acc.update(ids_1, ids_2, dist)
+            for acc, max_dist in zip(accs, max_dists):
+                if max_dist is None:
+                    acc.update(ids_1, ids_2, dist)
+                    continue
+                acc.update(ids_1, ids_2, np.where(dist > max_dist, np.nan, dist))
+
             if print_diff > 0 and (frame_id + 1) % print_diff == 0:
                 # print('Done {:d}/{:d} frames'.format(frame_id + 1, self.n_frames))
                 # sys.stdout.write("\033[F")
@@ -539,24 +654,6 @@ class Annotations(Objects):
                 sys.stdout.flush()
         sys.stdout.write('\rProcessed {:d}/{:d} frames\n'.format(self.n_frames, self.n_frames))
         sys.stdout.flush()
-        end_t = time.time()
-        fps = self.n_frames / (end_t - start_t)
-        self._logger.info('FPS: {:.3f}'.format(fps))
-
-        self._logger.info('Computing MOT metrics...')
-        start_t = time.time()
-        mh = mm.metrics.create()
-        summary = mh.compute(acc, metrics=mm.metrics.motchallenge_metrics, name=seq_name)
-        end_t = time.time()
-        fps = self.n_frames / (end_t - start_t)
-        self._logger.info('FPS: {:.3f}'.format(fps))
-
-        summary = summary.rename(columns=mm.io.motchallenge_metric_names)
-        strsummary = mm.io.render_summary(
-            summary,
-            formatters=mh.formatters
-        )
-        return summary, strsummary, acc
 
 
 class TrackingResults(Annotations):
@@ -581,6 +678,33 @@ class TrackingResults(Annotations):
         """
         self._params = params
 
+    @classmethod
+    def from_array(cls, data, params, logger, orig_n_frames, start_frame_id=-1, end_frame_id=-1, resize_factor=1):
+        """
+        build tracking results from data held in memory instead of reading it from a file
+
+        :param np.ndarray data: N x 10 array with the same contents as a results file; it is copied so the
+        caller can keep modifying it
+        :type params: TrackingResults.Params
+        :type logger: CustomLogger
+        :type orig_n_frames: int
+        :type start_frame_id: int
+        :type end_frame_id: int
+        :type resize_factor: float
+        :rtype: TrackingResults | None
+        """
+        params = copy.copy(params)
+        params.path = ''
+
+        obj = cls(params, logger)
+        obj.initialize(orig_n_frames, start_frame_id, end_frame_id)
+        obj.data = np.array(data, dtype=np.float64, ndmin=2)
+        obj._logger.info('Using {:d} objects from memory'.format(obj.data.shape[0]))
+
+        if not obj._build(resize_factor):
+            return None
+        return obj
+
     def read(self, resize_factor):
         """
         :type build_index: bool
@@ -590,6 +714,15 @@ class TrackingResults(Annotations):
         if not self._read():
             return False
 
+        return self._build(resize_factor)
+
+    def _build(self, resize_factor):
+        """
+        process and index the raw data
+
+        :type resize_factor: float
+        :rtype: bool
+        """
         self._process(resize_factor)
 
         if not self._sanity_check():
@@ -612,11 +745,183 @@ class TrackingResults(Annotations):
 
         self._logger.info('count: {:d}'.format(self.count))
 
-        if self._params.sort_by_frame_ids:
-            self._build_index()
-        else:
-            self._build_index_slow()
+        with profile('index'):
+            if self._params.sort_by_frame_ids:
+                self._build_index()
+            else:
+                self._build_index_slow()
 
-        self._build_trajectory_index()
+            self._build_trajectory_index()
 
         return True
+
+
+class EvaluationSession:
+    """
+    evaluate a tracker online by feeding it the tracking result of one frame at a time; running CLEAR MOT counters
+    are updated in each step so that the current metrics are always available in constant time
+
+    :type annotations: Annotations
+    :type acc: mm.MOTAccumulator
+    """
+
+    def __init__(self, annotations, dist_type=0, keep_events=1):
+        """
+        :param Annotations annotations: annotations of the sequence that is being tracked
+        :param int dist_type: 0: intersection over union (IoU) distance; 1: squared Euclidean distance
+        :param int keep_events: keep the events of all frames so that metrics that need the complete sequence,
+        like IDF1, can be computed by summary(); otherwise the events of each frame are discarded after counting
+        them so that the memory usage does not grow with the number of frames
+        :rtype: None
+        """
+        import evaluation.motmetrics as mm
+
+        self._mm = mm
+        self.annotations = annotations
+        self.keep_events = keep_events
+
+        if dist_type == 0:
+            self._dist_func = mm.distances.iou_matrix
+        else:
+            self._dist_func = mm.distances.norm2squared_matrix
+
+        self.acc = mm.MOTAccumulator(auto_id=False)
+
+        """ID of the last frame that has been evaluated"""
+        self.frame_id = -1
+
+        self.num_frames = 0
+        self.num_objects = 0
+        self.num_predictions = 0
+        self.num_matches = 0
+        self.num_switches = 0
+        self.num_false_positives = 0
+        self.num_misses = 0
+        """sum of the distances of all matches and switches"""
+        self.total_distance = 0.
+
+    def step(self, frame_id, ids, boxes):
+        """
+        evaluate the tracking result of one frame; frames must be provided in increasing order and any frames
+        skipped since the last step are evaluated as having no tracked objects
+
+        :param int frame_id: 0-based ID of the frame within the annotated sequence
+        :param np.ndarray ids: IDs of the tracked objects
+        :param np.ndarray boxes: N x 4 boxes of the tracked objects as x, y, width, height
+        :rtype: None
+        """
+        assert self.frame_id < frame_id < self.annotations.n_frames, \
+            'invalid frame_id: {} after {} for {} frames'.format(frame_id, self.frame_id, self.annotations.n_frames)
+
+        for _frame_id in range(self.frame_id + 1, frame_id):
+            self._update(_frame_id, [], [])
+        self._update(frame_id, ids, boxes)
+
+    def finish(self):
+        """
+        evaluate all the remaining frames as having no tracked objects
+
+        :rtype: None
+        """
+        for _frame_id in range(self.frame_id + 1, self.annotations.n_frames):
+            self._update(_frame_id, [], [])
+
+    def _update(self, frame_id, ids, boxes):
+        idx = self.annotations.idx[frame_id]
+        if idx is not None:
+            gt_boxes = self.annotations.data[idx, 2:6]
+            gt_ids = self.annotations.data[idx, 1]
+        else:
+            gt_boxes = []
+            gt_ids = []
+
+        dist = self._dist_func(gt_boxes, boxes)
+
+        start_id = len(self.acc._events)
+        self.acc.update(gt_ids, ids, dist, frameid=frame_id)
+
+        for event_type, _, _, event_dist in self.acc._events[start_id:]:
+            if event_type == 'MATCH':
+                self.num_matches += 1
+                self.total_distance += event_dist
+            elif event_type == 'SWITCH':
+                self.num_switches += 1
+                self.total_distance += event_dist
+            elif event_type == 'FP':
+                self.num_false_positives += 1
+            elif event_type == 'MISS':
+                self.num_misses += 1
+
+        if not self.keep_events:
+            del self.acc._events[:]
+            del self.acc._indices[:]
+
+        self.num_frames += 1
+        self.num_objects += len(gt_ids)
+        self.num_predictions += len(ids)
+        self.frame_id = frame_id
+
+    @property
+    def mota(self):
+        if not self.num_objects:
+            return np.nan
+        return 1. - float(self.num_misses + self.num_switches + self.num_false_positives) / self.num_objects
+
+    @property
+    def motp(self):
+        num_detections = self.num_matches + self.num_switches
+        if not num_detections:
+            return np.nan
+        return self.total_distance / num_detections
+
+    @property
+    def recall(self):
+        if not self.num_objects:
+            return np.nan
+        return float(self.num_matches + self.num_switches) / self.num_objects
+
+    @property
+    def precision(self):
+        if not self.num_predictions:
+            return np.nan
+        return float(self.num_matches + self.num_switches) / self.num_predictions
+
+    def counters(self):
+        """
+        current values of the running counters and the metrics computed from them
+
+        :rtype: dict
+        """
+        return dict(
+            num_frames=self.num_frames,
+            num_objects=self.num_objects,
+            num_predictions=self.num_predictions,
+            num_matches=self.num_matches,
+            num_switches=self.num_switches,
+            num_false_positives=self.num_false_positives,
+            num_misses=self.num_misses,
+            mota=self.mota,
+            motp=self.motp,
+            recall=self.recall,
+            precision=self.precision,
+        )
+
+    def summary(self, name):
+        """
+        all the MOT challenge metrics over the frames evaluated so far; unlike the counters, this processes all of
+        those frames so it should only be called at the end or occasionally
+
+        :param str name: name of the row in the summary
+        :rtype: pandas.DataFrame, str
+        """
+        assert self.keep_events, 'summary is only available if the events are kept'
+
+        mm = self._mm
+        mh = mm.metrics.create()
+        summary = mh.compute(self.acc, metrics=mm.metrics.motchallenge_metrics, name=name)
+        summary = summary.rename(columns=mm.io.motchallenge_metric_names)
+        strsummary = mm.io.render_summary(
+            summary,
+            formatters=mh.formatters
+        )
+        return summary, strsummary
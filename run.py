@@ -1,4 +1,5 @@
 import os
+import time
 import logging
 
 from paramparse import MultiPath
@@ -154,6 +155,15 @@ class Test:
         :ivar eval_file: Name of the file into which a summary of the evaluation
         result will be written if evaluation is enabled
 
+        :ivar watch: keep polling results_dir while the tracker is still writing the results and evaluate each
+        results file as soon as its size and modification time stop changing; the sequence and OVERALL
+        evaluation summaries are written to eval_file after each evaluation and files that change again
+        are evaluated again; stops once all sequences have been evaluated or one of them fails to load or evaluate
+        and only then writes the final OVERALL summary to the accumulative eval file
+
+        :ivar watch_interval: time in seconds between two polls of results_dir in watch mode; a results file is
+        considered complete when it has not changed over one interval
+
         """
 
         def __init__(self):
@@ -169,6 +179,9 @@ class Test:
 
             self.subseq_postfix = 1
 
+            self.watch = 0
+            self.watch_interval = 5.
+
             self._load_prefix = None
             self._save_prefix = None
 
@@ -181,7 +194,7 @@ class Test:
             self._synchronize(src)
 
     @staticmethod
-    def run(data, tester_params, test_params, logger):
+    def run(data, tester_params, test_params, logger, tester=None):
         """
         test a trained target
         :type trained_target: Target
@@ -189,6 +202,8 @@ class Test:
         :type tester_params: Tester.Params
         :type test_params: Test.Params
         :type logger: logging.RootLogger | logging.logger | CustomLogger
+        :param Tester | None tester: use this tester instead of creating a new one, e.g. to share its
+        annotations cache across runs
         :type logging_dir: str
         :type args_in: list
         :rtype: bool
@@ -199,7 +214,9 @@ class Test:
         assert test_params.start < len(test_params.seq), f"Invalid start_id: {test_params.start} " \
             f"for {len(test_params.seq)} sequences"
 
-        tester = Tester(tester_params, global_logger)
+        if tester is None:
+            """annotations are cached in watch mode since each sequence can be evaluated several times"""
+            tester = Tester(tester_params, global_logger, {} if test_params.watch else None)
 
         success = True
         eval_path = load_dir = None
@@ -221,6 +238,9 @@ class Test:
             save_txt += f' with save_prefix: {save_prefix}'
         global_logger.info(save_txt)
 
+        if test_params.watch and test_params.evaluate:
+            return Test.watch(data, tester, test_params, results_dir, global_logger)
+
         n_seq = len(test_params.seq)
         for _id, test_id in enumerate(test_params.seq[test_params.start:]):
             global_logger.info('Running tester on sequence {:d} in set {:d} ({:d} / {:d} )'.format(
@@ -297,4 +317,95 @@ class Test:
         if evaluate:
             tester.accumulative_eval(load_dir, eval_path, global_logger)
 
+        tester.save_profile()
+
+        return success
+
+    @staticmethod
+    def watch(data, tester, test_params, results_dir, logger):
+        """
+        evaluate the tracking results of each sequence as soon as they have been completely written
+
+        :type data: Data
+        :type tester: Tester
+        :type test_params: Test.Params
+        :type results_dir: str
+        :type logger: CustomLogger
+        :rtype: bool
+        """
+        load_dir = results_dir
+        load_prefix = test_params.load_prefix
+        if load_prefix:
+            load_dir = linux_path(load_dir, load_prefix)
+
+        eval_dir = test_params.eval_dir
+        if not eval_dir:
+            eval_dir = load_dir
+        eval_path = linux_path(eval_dir, test_params.eval_file)
+
+        load_paths = {}
+        for test_id in test_params.seq[test_params.start:]:
+            if not data.initialize(test_params.seq_set, test_id, 1, logger=logger):
+                logger.error('Data module failed to initialize with sequence {:d}'.format(test_id))
+                return False
+            if test_params.subseq_postfix:
+                load_fname = '{:s}_{:d}_{:d}.txt'.format(data.seq_name, data.start_frame_id + 1,
+                                                         data.end_frame_id + 1)
+            else:
+                load_fname = '{:s}.txt'.format(data.seq_name)
+            load_paths[test_id] = linux_path(load_dir, load_fname)
+
+        logger.info('watching {:s} for the results of {:d} sequences'.format(load_dir, len(load_paths)))
+
+        """size and modification time of each results file at the last poll and when it was last evaluated"""
+        polled = {}
+        evaluated = {}
+        success = True
+        try:
+            while success and len(evaluated) < len(load_paths):
+                for test_id, load_path in load_paths.items():
+                    try:
+                        stat = os.stat(load_path)
+                    except OSError:
+                        continue
+                    stat = (stat.st_size, stat.st_mtime)
+                    prev_stat, polled[test_id] = polled.get(test_id), stat
+
+                    if stat[0] == 0 or stat != prev_stat or stat == evaluated.get(test_id):
+                        """missing, still being written or already evaluated"""
+                        continue
+
+                    evaluated[test_id] = stat
+
+                    data.initialize(test_params.seq_set, test_id, 1, logger=logger)
+                    seq_logger = CustomLogger(logger, names=(data.seq_name,), key='custom_header')
+                    tester.initialize(data, seq_logger)
+
+                    if not tester.load(load_path):
+                        seq_logger.error('Tester loading failed on sequence {:d} : {:s}'.format(
+                            test_id, data.seq_name))
+                        success = False
+                        break
+
+                    if not tester.eval(load_path, eval_path, test_params.eval_dist_type):
+                        seq_logger.error('Tester evaluation failed on sequence {:d} : {:s}'.format(
+                            test_id, data.seq_name))
+                        success = False
+                        break
+
+                    """partial OVERALL summaries only go to eval_path so they cannot be mistaken for final ones"""
+                    tester.accumulative_eval(load_dir, eval_path, logger, write_accumulative=0)
+                    logger.info('evaluated {:d} / {:d} sequences'.format(len(evaluated), len(load_paths)))
+
+                if success and len(evaluated) < len(load_paths):
+                    time.sleep(test_params.watch_interval)
+        except KeyboardInterrupt:
+            logger.warning('watching interrupted after evaluating {:d} / {:d} sequences'.format(
+                len(evaluated), len(load_paths)))
+        else:
+            """same as the OVERALL summary that Test.run writes at the end"""
+            tester.accumulative_eval(load_dir, eval_path, logger, write_eval=0)
+
+        tester.save_profile()
+
         return success
@@ -7,7 +7,7 @@ np.seterr(all='raise')
 
 from input import Input
 from data import Data
-from utilities import motmetrics_to_file, combined_motmetrics, CustomLogger, add_suffix
+from utilities import motmetrics_to_file, combined_motmetrics, CustomLogger, add_suffix, profile, profiler
 
 
 class Tester:
@@ -18,28 +18,47 @@ class Tester:
     """
 
     class Params:
+        """
+        :ivar profile: time the stages of reading, indexing, accumulating, computing metrics and writing
+        the evaluation files and save a report to profile_path at the end of each run
+
+        :ivar profile_path: path of the profiling report; a time stamp is appended to the file name for each run;
+        the report is written as JSON if the extension is .json and in the collapsed stack format accepted by
+        flame graph tools otherwise
+        """
+
         def __init__(self):
 
             self.devkit = 0
             self.accumulative_eval_path = 'log/mot_metrics_accumulative.log'
+            self.profile = 0
+            self.profile_path = 'log/profile.json'
             self.input = Input.Params()
 
-    def __init__(self, params, logger):
+    def __init__(self, params, logger, annotations_cache=None):
         """
         :type params: Tester.Params
         :type logger: CustomLogger
+        :param dict | None annotations_cache: shared cache of annotations that have already been read;
+        see Input.__init__
         :rtype: None
         """
 
         self._params = params
         self._logger = logger
 
-        self.input = Input(self._params.input, self._logger)
+        self.input = Input(self._params.input, self._logger, annotations_cache)
 
         self.annotations = None
 
         self._acc_dict = {}
 
+        """string summaries of the evaluation of each sequence and of all of them combined (OVERALL)"""
+        self.summaries = {}
+
+        if self._params.profile:
+            profiler.enabled = 1
+
     def initialize(self, data=None, logger=None):
         """
         :type data: Data | None
@@ -56,8 +75,9 @@ class Tester:
             if not self.input.initialize(data, logger=self._logger):
                 raise IOError('Input pipeline could not be initialized')
 
-            if not self.input.read_annotations():
-                raise IOError('Annotations could not be read')
+            with profile('annotations'):
+                if not self.input.read_annotations():
+                    raise IOError('Annotations could not be read')
 
             self.annotations = self.input.annotations
 
@@ -66,7 +86,7 @@ class Tester:
     def eval(self, load_fname, eval_path, eval_dist_type):
         """
         :type load_fname: str
-        :type eval_path: str
+        :param str eval_path: file to which the evaluation summary is appended; nothing is written if this is empty
         :type eval_dist_type: int
         :rtype: mm.MOTAccumulator | None
         """
@@ -88,27 +108,57 @@ class Tester:
 
             _eval = eval_str = None
         else:
-            _eval, eval_str, acc = self.input.annotations.get_mot_metrics(self.input.tracking_res,
-                                                                          seq_name, eval_dist_type)
+            with profile('eval'):
+                _eval, eval_str, acc = self.input.annotations.get_mot_metrics(self.input.tracking_res,
+                                                                              seq_name, eval_dist_type)
 
         time_stamp = datetime.now().strftime("%y%m%d_%H%M%S_%f")
         if eval_str is not None:
             print('\n' + eval_str + '\n')
+            self.summaries[self.input.seq_name] = eval_str
             if _eval is None:
                 return None
-            motmetrics_to_file((eval_path,), _eval, load_fname, seq_name,
-                               mode='a', time_stamp=time_stamp, devkit=self._params.devkit)
+            if eval_path:
+                with profile('write'):
+                    motmetrics_to_file((eval_path,), _eval, load_fname, seq_name,
+                                       mode='a', time_stamp=time_stamp, devkit=self._params.devkit)
 
         self._acc_dict[self.input.seq_name] = acc
 
         return acc
 
-    def accumulative_eval(self, load_dir, eval_path, _logger):
+    def eval_arrays(self, results, eval_path='', eval_dist_type=0):
+        """
+        evaluate tracking results held in memory, e.g. by the tracker itself, on the sequence this tester
+        has been initialized with instead of loading them from a file first
+
+        :param np.ndarray results: N x 10 array with the same contents as a results file
+        :param str eval_path: file to which the evaluation summary is appended; nothing is written if this is empty
+        :type eval_dist_type: int
+        :rtype: mm.MOTAccumulator | None
+        """
+        assert not self._params.devkit, "devkit evaluation needs the tracking results in a file"
+        assert self.input.annotations is not None, "annotations have not been loaded"
+
+        with profile('load'):
+            success = self.input.set_tracking_results(results)
+        if not success:
+            self._logger.error('Tracking results could not be built')
+            return None
+
+        """used as the file name in the evaluation summary"""
+        load_fname = '{:s}_{:d}_{:d}.txt'.format(self.input.seq_name, self.input.start_frame_id + 1,
+                                             self.input.end_frame_id + 1)
+        return self.eval(load_fname, eval_path, eval_dist_type)
+
+    def accumulative_eval(self, load_dir, eval_path, _logger, write_eval=1, write_accumulative=1):
         """
 
         :param str load_dir:
         :param str eval_path:
         :param CustomLogger _logger:
+        :param int write_eval: write the OVERALL row (and the sequence rows in devkit mode) to eval_path
+        :param int write_accumulative: write the OVERALL row to accumulative_eval_path
         :return:
         """
         accumulative_eval_path = self._params.accumulative_eval_path
@@ -140,24 +190,57 @@ class Tester:
             eval = MOT_evaluator()
             _, _, summary, strsummary = eval.run(gtfiles, tsfiles, datadir, sequences, benchmark_name)
 
-            for _seq in self._acc_dict:
-                _args = self._acc_dict[_seq]
-                _gtfiles, _tsfiles, _datadir, _sequences, _benchmark_name = _args
-                motmetrics_to_file((eval_path,), summary, _tsfiles[0], _sequences[0], mode='a',
-                                   time_stamp=time_stamp, verbose=0, devkit=self._params.devkit)
+            if write_eval:
+                for _seq in self._acc_dict:
+                    _args = self._acc_dict[_seq]
+                    _gtfiles, _tsfiles, _datadir, _sequences, _benchmark_name = _args
+                    motmetrics_to_file((eval_path,), summary, _tsfiles[0], _sequences[0], mode='a',
+                                       time_stamp=time_stamp, verbose=0, devkit=self._params.devkit)
 
         else:
-            summary, strsummary = combined_motmetrics(self._acc_dict, _logger)
+            with profile('overall'):
+                summary, strsummary = combined_motmetrics(self._acc_dict, _logger)
+
+        eval_paths = []
+        if write_eval:
+            eval_paths.append(eval_path)
+        if write_accumulative:
+            eval_paths.append(accumulative_eval_path)
+
+        with profile('write'):
+            motmetrics_to_file(eval_paths, summary, load_dir, 'OVERALL',
+                               time_stamp=time_stamp, devkit=self._params.devkit)
+
+        self.summaries['OVERALL'] = strsummary
+
+    def save_profile(self):
+        """
+        write the timings recorded so far to a time stamped version of profile_path
+
+        :rtype: str | None
+        """
+        if not self._params.profile:
+            return None
+
+        time_stamp = datetime.now().strftime("%y%m%d_%H%M%S")
+        profile_path = add_suffix(self._params.profile_path, time_stamp)
+
+        self._logger.info('profile:\n{}'.format(profiler.render()))
+        self._logger.info('saving profile to: {}'.format(profile_path))
+
+        profiler.save(profile_path)
+        profiler.reset()
 
-        motmetrics_to_file((eval_path, accumulative_eval_path), summary, load_dir, 'OVERALL',
-                           time_stamp=time_stamp, devkit=self._params.devkit)
+        return profile_path
 
     def load(self, load_path):
         """
         :type load_path: str
         :rtype: bool
         """
-        if not self.input.read_tracking_results(load_path):
+        with profile('load'):
+            success = self.input.read_tracking_results(load_path)
+        if not success:
             self._logger.error('Tracking results could not be loaded')
             return False
         self._logger.info('Tracking results loaded successfully')
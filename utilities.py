@@ -2,9 +2,10 @@ import numpy as np
 import os
 import copy
 import time
-from pprint import pformat
 import functools
 import logging
+import json
+import threading
 from io import StringIO
 from contextlib import contextmanager
 from datetime import datetime
@@ -168,41 +169,154 @@ class CustomLogger:
         return _logger
 
 
-@contextmanager
-def profile(_id, _times, _rel_times, enable=1):
+class Profiler:
     """
+    registry of nested wall-clock timers that can be shared between threads;
+    timers are aggregated by their full path of enclosing sections so that the same section name
+    can appear under multiple parents
 
-    :param _id:
-    :param dict _times:
-    :param int enable:
-    :return:
+    disabled sections reduce to a single attribute check and return a shared do-nothing context manager
+    so that instrumentation can be left in place in hot loops
+
+    :ivar enabled: record timings for sections that do not explicitly override this
+    :type enabled: int | bool
     """
-    if not enable:
-        yield None
 
-    else:
-        start_t = time.time()
-        yield None
-        end_t = time.time()
-        _time = end_t - start_t
+    class _Disabled:
+        def __enter__(self):
+            return None
+
+        def __exit__(self, *args):
+            return False
+
+    _disabled = _Disabled()
+
+    def __init__(self, enabled=0):
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        """path tuple -> [count, total time, self time]"""
+        self._records = {}
+
+    def section(self, name, enable=None):
+        """
+        context manager that times the enclosed block as a child of the currently open section
+        in the calling thread
+
+        :param str name:
+        :param int | bool | None enable: override the registry-wide enabled flag for this section;
+        if None, the section is recorded if the registry is enabled or it is enclosed in a recorded section
+        """
+        if enable is None:
+            enable = self.enabled or getattr(self._local, 'stack', None)
+        if not enable:
+            return Profiler._disabled
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        try:
+            stack = self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
 
-        print(f'{_id} :: {_time}')
+        """name and accumulated time of child sections"""
+        entry = [name, 0.]
+        stack.append(entry)
+        start_t = time.perf_counter()
+        try:
+            yield None
+        finally:
+            _time = time.perf_counter() - start_t
+            path = tuple(_entry[0] for _entry in stack)
+            stack.pop()
+            if stack:
+                stack[-1][1] += _time
+
+            with self._lock:
+                record = self._records.get(path)
+                if record is None:
+                    record = self._records[path] = [0, 0., 0.]
+                record[0] += 1
+                record[1] += _time
+                record[2] += _time - entry[1]
+
+    def reset(self):
+        with self._lock:
+            self._records = {}
+
+    def report(self):
+        """
+        aggregated timings sorted by path so that each section is followed by its children
 
-        if _times is not None:
+        :rtype: list[dict]
+        """
+        with self._lock:
+            records = sorted(self._records.items())
+
+        total_time = sum(_total for _path, (_, _total, _) in records if len(_path) == 1)
+
+        return [
+            {
+                'path': '/'.join(_path),
+                'count': _count,
+                'total': _total,
+                'self': _self,
+                'rel': _total / total_time if total_time > 0 else 0.,
+            }
+            for _path, (_count, _total, _self) in records
+        ]
+
+    def render(self):
+        """
+        :rtype: str
+        """
+        lines = ['{:>8s}\t{:>10s}\t{:>10s}\t{:>7s}\t{:s}'.format('count', 'total', 'self', 'rel', 'section')]
+        for _record in self.report():
+            depth = _record['path'].count('/')
+            lines.append('{:8d}\t{:10.4f}\t{:10.4f}\t{:6.2f}%\t{:s}{:s}'.format(
+                _record['count'], _record['total'], _record['self'], _record['rel'] * 100,
+                '  ' * depth, _record['path'].rsplit('/', 1)[-1]))
+        return '\n'.join(lines)
+
+    def save(self, out_path):
+        """
+        write the report as JSON if out_path has a .json extension and
+        in the collapsed stack format used by flame graph tools otherwise
+        with one line per section containing its self time in microseconds
 
-            _times[_id] = _time
+        :param str out_path:
+        :rtype: None
+        """
+        out_dir = os.path.dirname(out_path)
+        if out_dir and not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+
+        records = self.report()
+
+        with open(out_path, 'w') as fid:
+            if os.path.splitext(out_path)[1].lower() == '.json':
+                json.dump(records, fid, indent=4)
+                return
 
-            total_time = np.sum(list(_times.values()))
+            for _record in records:
+                fid.write('{:s} {:d}\n'.format(_record['path'].replace('/', ';'),
+                                               int(round(_record['self'] * 1e6))))
 
-            if _rel_times is not None:
 
-                for __id in _times:
-                    rel__time = _times[__id] / total_time
-                    _rel_times[__id] = rel__time
+"""registry shared by all the modules"""
+profiler = Profiler()
 
-                rel_times = [(k, v) for k, v in sorted(_rel_times.items(), key=lambda item: item[1])]
 
-                print(f'rel_times:\n {pformat(rel_times)}')
+def profile(name, enable=None):
+    """
+    time the enclosed block in the shared registry
+
+    :param str name:
+    :param int | bool | None enable:
+    """
+    return profiler.section(name, enable)
 
 
 # overlaps between two sets of labeled objects, typically the annotations and the detections